@@ -6,102 +6,1638 @@
 #   "matplotlib",
 #   "httpx",
 #   "chardet",
+#   "pyarrow",
 #   "python-dotenv",
 # ]
 # ///
 
+import asyncio
+import base64
+import codecs
+import contextvars
+import email.utils
+import functools
+import hashlib
+import importlib.util
+import io
+import json
 import os
+import random
+import sqlite3
 import sys
+import tempfile
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import numpy as np
 import pandas as pd
-import seaborn as sns
-import matplotlib
-import matplotlib.pyplot as plt
-import httpx
-import chardet
-from dotenv import load_dotenv
 
-# Force non-interactive matplotlib backend
-matplotlib.use('Agg')
-
-# Load environment variables
-load_dotenv()
+# Heavy or optional modules (matplotlib, seaborn, httpx, chardet, dotenv, pyarrow) are imported in the
+# stages that use them, so startup stays fast and --analysis-only never loads the plotting stack.
 
 # Constants
-API_URL = "https://aiproxy.sanand.workers.dev/openai/v1/chat/completions"
-AIPROXY_TOKEN = os.getenv("AIPROXY_TOKEN")
+API_BASE = os.getenv("AUTOLYSIS_API_BASE", "https://aiproxy.sanand.workers.dev/openai/v1")  # Any OpenAI-compatible base
+API_URL = f"{API_BASE}/chat/completions"
+CACHE_DIR = os.getenv("AUTOLYSIS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "autolysis"))
+ENCODING_WINDOW_BYTES = 256 * 1024  # Size of each sampled window used for encoding detection
+ENCODING_WINDOWS = 8  # Number of windows sampled across the file (prefix, strided middle, suffix)
+STREAM_CHUNKSIZE = 100_000  # Rows per chunk in --stream mode
+STREAM_SAMPLE_ROWS = 10_000  # Uniform row sample kept in --stream mode for plotting
+SAMPLE_CONFIDENCE = 0.95  # Confidence level of the intervals attached to --sample analyses
+QUANTILE_SKETCH_CAPACITY = 512  # Items per level of the KLL-style quantile sketch
+HLL_PRECISION = 14  # HyperLogLog uses 2**14 registers (~0.8% standard error)
+HEAVY_HITTERS = 64  # Counters kept by the Misra-Gries top-value sketch
+FRAME_CACHE_MODE = os.getenv("AUTOLYSIS_FRAME_CACHE", "on")  # on, off (bypass) or refresh (re-parse and overwrite)
+FRAME_CACHE_VERSION = 2  # Bump when the cached dtypes change so old frames are re-parsed
+CATEGORY_MAX_RATIO = 0.5  # Text columns with at most this share of distinct values become categoricals
+CORRELATION_TOP_K = 50  # Strongest pairs kept in the analysis
+CORRELATION_MATRIX_COLUMNS = 12  # Columns in the compact matrix used for the heatmap
+CORRELATION_BLOCK_COLUMNS = 256  # Column block size, so each block's operands stay cache-sized
+CORRELATION_BLOCK_ROWS = 65_536  # Row block size; float32 partial sums are accumulated in float64
+OUTLIER_Z = 3.5  # Robust z-score beyond which a value is an outlier (Iglewicz and Hoaglin)
+OUTLIER_ROW_BUDGET = 100_000  # Rows sampled to fit medians, MADs and the covariance; every loaded row is scored
+OUTLIER_CHUNK_ROWS = 262_144  # Rows scored per vectorized chunk
+OUTLIER_TOP_ROWS = 10  # Most anomalous rows summarized for the narrative
+HISTOGRAM_BINS = 30
+KDE_GRID_SIZE = 256  # Points on the fixed grid each KDE curve is evaluated on
+PAIRPLOT_MAX_COLUMNS = 5  # Pairplot only the most correlated numeric columns
+PLOT_ROW_BUDGET = 5_000  # Scatter panels are drawn from at most this many sampled rows
+
+LLM_CACHE_MODE = os.getenv("AUTOLYSIS_LLM_CACHE", "on")  # on, off (bypass) or refresh (re-fetch and overwrite)
+LLM_CACHE_TTL = float(os.getenv("AUTOLYSIS_LLM_CACHE_TTL_DAYS", "30")) * 86400
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("AUTOLYSIS_LLM_CACHE_MAX_MB", "64")) * 1024 * 1024)
+LLM_MAX_RETRIES = int(os.getenv("AUTOLYSIS_LLM_RETRIES", "4"))  # Retries on 429, 5xx and network errors
+LLM_RPM = float(os.getenv("AUTOLYSIS_LLM_RPM", "0"))  # Requests per minute allowed (0 for unlimited)
+LLM_TPM = float(os.getenv("AUTOLYSIS_LLM_TPM", "0"))  # Tokens per minute allowed (0 for unlimited)
+PROMPT_TOKEN_BUDGET = 1500  # Approximate tokens allowed for the analysis facts in the narrative prompt
+CHARS_PER_TOKEN = 4  # Rough English/Markdown average used to estimate prompt size without a tokenizer
+NARRATIVE_SECTION_TIMEOUT = 30.0  # Seconds each README section may take before its templated fallback is used
+NARRATIVE_CHARTS = 4  # Charts sent to the vision model for commentary
+CHART_IMAGE_SIDE = 512  # Charts are downscaled to this before upload: low-detail images are seen at 512px
+IMAGE_TOKENS = 85  # Prompt tokens charged per low-detail image
+TRACE_PATH = os.getenv("AUTOLYSIS_TRACE")  # JSONL span trace in evaluate.py's format (unset: tracing off)
+
+PlotSpec = namedtuple('PlotSpec', ['kind', 'columns', 'path'])
+# One README section: the prompt_sections() tables it is written from, what to ask for, the lead-in
+# placed before those tables when the LLM call fails ({overview} is the one-line summary), and the
+# whole text when there are no facts for it
+NarrativeSection = namedtuple('NarrativeSection', ['title', 'facts', 'instructions', 'fallback', 'empty'])
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+_trace_fd = None
+
+class _NoSpan:
+    """Shared no-op span used when tracing is off."""
+
+    def __bool__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+NO_SPAN = _NoSpan()
+
+def _traceparent(value):
+    """(trace id, span id) from a W3C traceparent value such as evaluate.py passes in, else None."""
+    parts = (value or '').split('-')
+    return (parts[1], parts[2]) if len(parts) == 4 else None
+
+TRACE_ROOT = _traceparent(os.getenv('TRACEPARENT'))
+
+class Span:
+    """Times a block and appends it to TRACE_PATH as a JSON line."""
 
-if not AIPROXY_TOKEN:
-    raise ValueError("API token not set. Please set AIPROXY_TOKEN in the environment.")
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.trace_id, self.parent_id = parent or (os.urandom(16).hex(), None)
+        self.span_id = os.urandom(8).hex()
+        self.attributes = attributes
 
-def load_data(file_path):
-    """Load CSV data with encoding detection."""
+    @property
+    def context(self):
+        return self.trace_id, self.span_id
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start, self.clock = time.time(), time.perf_counter()
+        self.token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.clock
+        _current_span.reset(self.token)
+        record = {'name': self.name, 'service': 'autolysis', 'trace_id': self.trace_id, 'span_id': self.span_id,
+                  'parent_id': self.parent_id, 'start': round(self.start, 6), 'duration': round(duration, 6),
+                  'pid': os.getpid(), 'attributes': self.attributes}
+        if exc_type:
+            record['error'] = repr(exc)
+        _write_span(record)
+        return False
+
+def _write_span(record):
+    global _trace_fd
     try:
-        with open(file_path, 'rb') as f:
-            result = chardet.detect(f.read())
-        encoding = result['encoding']
-        return pd.read_csv(file_path, encoding=encoding)
+        if _trace_fd is None:
+            _trace_fd = os.open(TRACE_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(_trace_fd, (json.dumps(record, default=str) + '\n').encode())
+    except OSError as e:
+        print(f"Could not write trace: {e}")
+
+def trace_span(name, parent=None, **attributes):
+    """Context manager timing `name` under `parent` (default: the current span), or NO_SPAN when tracing is off."""
+    if not TRACE_PATH:
+        return NO_SPAN
+    return Span(name, parent or trace_context(), attributes)
+
+def trace_context():
+    """(trace id, span id) of the current span, to parent spans in other processes."""
+    span = _current_span.get()
+    return span.context if span else TRACE_ROOT
+
+def current_span():
+    """The innermost open span, or NO_SPAN, for attaching attributes."""
+    return _current_span.get() or NO_SPAN
+
+def traced(name):
+    """Trace each call of the decorated function; a no-op at definition time when tracing is off."""
+    def decorate(function):
+        if not TRACE_PATH:
+            return function
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with trace_span(name):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with trace_span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _encoding_cache_path():
+    return os.path.join(CACHE_DIR, 'encodings.json')
+
+def _read_encoding_cache():
+    try:
+        with open(_encoding_cache_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_encoding_cache(cache):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = _encoding_cache_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, _encoding_cache_path())
+    except OSError as e:
+        print(f"Could not write encoding cache: {e}")
+
+def _sequential_windows(f):
+    """Yield (offset, bytes) windows covering the rest of the file."""
+    offset = f.tell()
+    while chunk := f.read(ENCODING_WINDOW_BYTES):
+        yield offset, chunk
+        offset += len(chunk)
+
+def _sample_windows(f, size):
+    """Yield bounded (offset, bytes) windows: the whole file if small, else prefix, strided middle and suffix."""
+    if size <= ENCODING_WINDOW_BYTES * ENCODING_WINDOWS:
+        yield from _sequential_windows(f)
+        return
+    stride = (size - ENCODING_WINDOW_BYTES) // (ENCODING_WINDOWS - 1)
+    for i in range(ENCODING_WINDOWS):
+        f.seek(i * stride)
+        yield i * stride, f.read(ENCODING_WINDOW_BYTES)
+
+def _is_utf8(windows):
+    """Validate (offset, bytes) windows as UTF-8, tolerating characters split at window edges.
+
+    Adjacent windows share one incremental decoder; a window after a gap first skips the continuation
+    bytes of a character that started before it.
+    """
+    decoder, end = None, 0
+    for offset, chunk in windows:
+        skip = 0
+        if decoder is None or offset != end:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            while offset and skip < min(3, len(chunk)) and 0x80 <= chunk[skip] < 0xC0:
+                skip += 1
+        end = offset + len(chunk)
+        try:
+            decoder.decode(chunk[skip:], final=False)
+        except UnicodeDecodeError:
+            return False
+    return True
+
+def sniff_encoding(file_path, full_scan=False):
+    """Detect the file encoding from bounded samples (or a streamed full scan) without buffering the file."""
+    size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in ((codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+                              (codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'),
+                              (codecs.BOM_UTF16_BE, 'utf-16')):
+            if head.startswith(bom):
+                return encoding
+        f.seek(0)
+        if full_scan:
+            if _is_utf8(_sequential_windows(f)):
+                return 'utf-8'
+            f.seek(0)
+            windows = _sequential_windows(f)
+        else:
+            windows = list(_sample_windows(f, size))
+            if _is_utf8(windows):
+                return 'utf-8'
+
+        # Not UTF-8: let chardet look at the same samples, stopping as soon as it is confident
+        from chardet import UniversalDetector
+        detector = UniversalDetector()
+        for _, chunk in windows:
+            detector.feed(chunk)
+            if detector.done:
+                break
+        detector.close()
+    encoding = detector.result['encoding'] or 'utf-8'
+    if full_scan and encoding.lower() in ('ascii', 'utf-8'):
+        return 'latin-1'  # The full scan proved it is not UTF-8: use a byte-transparent codec
+    return encoding
+
+def _store_encoding(file_path, stat, encoding):
+    cache = _read_encoding_cache()
+    cache[os.path.abspath(file_path)] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'encoding': encoding}
+    _write_encoding_cache(cache)
+
+@traced('encoding')
+def detect_encoding(file_path):
+    """Return the file encoding, cached per path, mtime and size."""
+    stat = os.stat(file_path)
+    entry = _read_encoding_cache().get(os.path.abspath(file_path))
+    if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        current_span().set(encoding=entry['encoding'], cached=True)
+        return entry['encoding']
+    encoding = sniff_encoding(file_path)
+    current_span().set(encoding=encoding, cached=False, bytes=stat.st_size)
+    _store_encoding(file_path, stat, encoding)
+    return encoding
+
+def _fallback_encoding(file_path):
+    """Redo detection over a streamed full scan after the sampled encoding failed to decode."""
+    encoding = sniff_encoding(file_path, full_scan=True)
+    _store_encoding(file_path, os.stat(file_path), encoding)
+    return encoding
+
+@traced('parse')
+def _read_csv(file_path, columns=None):
+    """Parse the CSV with sampled encoding detection, falling back to a full scan on decode errors."""
+    try:
+        return pd.read_csv(file_path, encoding=detect_encoding(file_path), usecols=columns)
+    except UnicodeDecodeError:
+        return pd.read_csv(file_path, encoding=_fallback_encoding(file_path), usecols=columns)
+
+@traced('optimize_dtypes')
+def optimize_dtypes(df):
+    """Shrink dtypes in place without losing information, returning (df, per-column memory report).
+
+    Repetitive text becomes categorical and other text pyarrow-backed strings; integers are downcast
+    and floats narrowed to float32 only when every value survives the round trip.
+    """
+    before = df.memory_usage(deep=True, index=False)
+    dtypes = df.dtypes.astype(str)
+    arrow_strings = importlib.util.find_spec('pyarrow') is not None
+    for column in df.columns:
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_string_dtype(series) or series.dtype == object:
+            if series.nunique() <= CATEGORY_MAX_RATIO * len(series):
+                df[column] = series.astype('category')
+            elif series.dtype == object and arrow_strings and pd.api.types.infer_dtype(series) == 'string':
+                df[column] = series.astype('string[pyarrow]')
+        elif pd.api.types.is_integer_dtype(series):
+            df[column] = pd.to_numeric(series, downcast='integer')
+        elif series.dtype == np.float64:
+            downcast = series.astype('float32')
+            if series.equals(downcast.astype(series.dtype)):
+                df[column] = downcast
+    report = pd.DataFrame({
+        'dtype_before': dtypes,
+        'dtype_after': df.dtypes.astype(str),
+        'bytes_before': before,
+        'bytes_after': df.memory_usage(deep=True, index=False),
+    })
+    return df, report
+
+def print_memory_report(report):
+    """Print optimize_dtypes()' before/after memory per column and in total."""
+    for column, row in report.iterrows():
+        print(f"{column}: {row.dtype_before} {row.bytes_before / 1024:,.0f} KB -> "
+              f"{row.dtype_after} {row.bytes_after / 1024:,.0f} KB")
+    before, after = report.bytes_before.sum(), report.bytes_after.sum()
+    print(f"Memory: {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB ({before / max(after, 1):.1f}x smaller)")
+
+def _file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _frame_cache_path(file_path):
+    return os.path.join(CACHE_DIR, 'frames', f'{_file_sha256(file_path)}-v{FRAME_CACHE_VERSION}.arrow')
+
+def _read_frame_cache(cache_path, columns=None):
+    """Memory-map a cached Arrow IPC frame, reading only the requested columns."""
+    from pyarrow import feather
+    table = feather.read_table(cache_path, columns=columns, memory_map=True)
+    # split_blocks lets numeric columns without nulls stay zero-copy views of the mapped file
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+def _write_frame_cache(cache_path, df):
+    from pyarrow import feather
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+        # Uncompressed so later loads can memory-map it instead of decompressing
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write frame cache: {e}")
+
+@traced('load')
+def load_data(file_path, columns=None, cache_mode=None, memory_report=False):
+    """Load CSV data with sampled encoding detection and compact dtypes.
+
+    Parsed frames are cached as Arrow files keyed by the CSV's SHA-256, so repeat runs skip
+    parsing and memory-map the cache. `columns` limits the load to those columns.
+    `memory_report` prints optimize_dtypes()' per-column savings when the CSV is parsed.
+    """
+    cache_mode = cache_mode or FRAME_CACHE_MODE
+    try:
+        use_cache = cache_mode != 'off' and importlib.util.find_spec('pyarrow') is not None
+        if use_cache:
+            cache_path = _frame_cache_path(file_path)
+            if cache_mode != 'refresh' and os.path.exists(cache_path):
+                try:
+                    df = _read_frame_cache(cache_path, columns)
+                    current_span().set(frame_cache='hit', rows=len(df), columns=df.shape[1])
+                    if memory_report:
+                        print(f"Loaded compact frame from {cache_path}")
+                        print_memory_report(optimize_dtypes(df)[1])
+                    return df
+                except Exception as e:
+                    print(f"Ignoring unreadable frame cache {cache_path}: {e}")
+        # The cache holds every column, so only narrow the parse when there is no cache to fill
+        df, report = optimize_dtypes(_read_csv(file_path, None if use_cache else columns))
+        if memory_report:
+            print_memory_report(report)
+        if use_cache:
+            _write_frame_cache(cache_path, df)
+        current_span().set(frame_cache='miss' if use_cache else 'off', rows=len(df), columns=df.shape[1])
+        return df[columns] if columns else df
     except Exception as e:
         print(f"Error loading file: {e}")
         sys.exit(1)
 
-def analyze_data(df):
+@traced('analyze')
+def analyze_data(df, correlation_method='pearson'):
     """Perform basic data analysis."""
     numeric_df = df.select_dtypes(include=['number'])  # Select only numeric columns
+    correlation = correlate(numeric_df, method=correlation_method)
     analysis = {
         'summary': df.describe(include='all').to_dict(),
         'missing_values': df.isnull().sum().to_dict(),
-        'correlation': numeric_df.corr().to_dict()  # Compute correlation only on numeric columns
+        # Compact matrix of the most correlated columns, plus the strongest pairs across all of them
+        'correlation': correlation_matrix_dict(correlation),
+        'correlation_pairs': [[a, b, r] for a, b, r, _ in correlation['pairs']],
     }
     return analysis
 
-def visualize_data(df, output_dir):
-    """Generate and save visualizations."""
-    sns.set(style="whitegrid")
+def _standardize(df, method='pearson'):
+    """Column-standardized float32 values (0 where missing) and the float32 presence mask (None if complete).
+
+    Spearman ranks each column first (average ranks for ties), so its correlation is Pearson on ranks.
+    Each column is ranked once over its own present values rather than per pair of complete rows, so with
+    missing values Spearman approximates pandas' (within about 0.003 on happiness.csv); without, it is exact.
+    """
+    rows, k = df.shape
+    values = np.zeros((rows, k), dtype=np.float32)
+    mask = np.ones((rows, k), dtype=np.float32)
+    valid = np.zeros(k, dtype=bool)
+    for i, column in enumerate(df.columns):
+        series = df[column].rank() if method == 'spearman' else df[column]
+        column_values = series.to_numpy(dtype=float, na_value=np.nan)
+        present = ~np.isnan(column_values)
+        if present.sum() < 2:
+            continue
+        mean, std = column_values[present].mean(), column_values[present].std(ddof=1)
+        valid[i] = std > 0
+        if valid[i]:
+            values[present, i] = (column_values[present] - mean) / std
+        mask[~present, i] = 0
+    return values, (None if mask.all() else mask), valid
+
+def _block_correlation(values, mask, a, b, block_rows=CORRELATION_BLOCK_ROWS):
+    """Pairwise-complete Pearson r and pair counts between column slices a and b of standardized values.
+
+    Without missing values this is one matrix multiply per row block. Otherwise mask matrices give each
+    pair's count, sums and sums of squares over the rows where both columns are present.
+    """
+    xa, xb = values[:, a], values[:, b]
+    if mask is None:
+        product = np.zeros((xa.shape[1], xb.shape[1]))
+        for start in range(0, len(values), block_rows):
+            product += xa[start:start + block_rows].T @ xb[start:start + block_rows]
+        n = np.full(product.shape, float(len(values)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return product / (n - 1), n
+    ma, mb = mask[:, a], mask[:, b]
+    n, sx, sy, sxx, syy, sxy = (np.zeros((xa.shape[1], xb.shape[1])) for _ in range(6))
+    for start in range(0, len(values), block_rows):
+        rows = slice(start, start + block_rows)
+        x, y, mx, my = xa[rows], xb[rows], ma[rows], mb[rows]
+        n += mx.T @ my
+        sx += x.T @ my
+        sy += mx.T @ y
+        sxx += (x * x).T @ my
+        syy += mx.T @ (y * y)
+        sxy += x.T @ y
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+    return np.where(n > 1, np.clip(r, -1, 1), np.nan), n
+
+@traced('correlate')
+def correlate(df, method='pearson', top_k=CORRELATION_TOP_K, matrix_columns=CORRELATION_MATRIX_COLUMNS,
+              block_columns=CORRELATION_BLOCK_COLUMNS):
+    """Pairwise-complete Pearson (or Spearman) correlation of numeric columns, computed blockwise in float32.
+
+    Never materializes the full k x k matrix. Returns a dict with:
+      pairs: the top_k (column A, column B, r, rows) pairs by |r|, strongest first
+      strength: {column: strongest |r| with any other column} for columns that have one
+      columns, matrix: the dense matrix of the matrix_columns most strongly correlated columns
+    """
+    columns = list(df.columns)
+    values, mask, valid = _standardize(df, method)
+    k = len(columns)
+    strength = np.full(k, np.nan)
+    best = np.empty((0, 4))  # r, i, j, n of the strongest pairs so far
+    for i0 in range(0, k, block_columns):
+        for j0 in range(i0, k, block_columns):
+            a, b = slice(i0, min(i0 + block_columns, k)), slice(j0, min(j0 + block_columns, k))
+            r, n = _block_correlation(values, mask, a, b)
+            r[~valid[a], :] = np.nan
+            r[:, ~valid[b]] = np.nan
+            if i0 == j0:
+                r[np.tril_indices_from(r)] = np.nan
+            magnitude = np.abs(r)
+            # fmax ignores NaN, so columns without any valid pair keep NaN strength
+            strength[a] = np.fmax(strength[a], np.fmax.reduce(magnitude, axis=1, initial=np.nan))
+            strength[b] = np.fmax(strength[b], np.fmax.reduce(magnitude, axis=0, initial=np.nan))
+            if top_k:
+                ii, jj = np.nonzero(~np.isnan(r))
+                best = np.concatenate([best, np.column_stack([r[ii, jj], ii + i0, jj + j0, n[ii, jj]])])
+                if len(best) > top_k:
+                    best = best[np.argpartition(-np.abs(best[:, 0]), top_k)[:top_k]]
+    best = best[np.argsort(-np.abs(best[:, 0]), kind='stable')]
+
+    # The heatmap shows the most strongly correlated columns, in their original order
+    order = [i for i in np.argsort(-np.nan_to_num(strength, nan=-1.0), kind='stable')][:matrix_columns]
+    chosen = sorted(order)
+    matrix, _ = _block_correlation(values, mask, chosen, chosen)
+    matrix[~valid[chosen], :] = np.nan
+    matrix[:, ~valid[chosen]] = np.nan
+    np.fill_diagonal(matrix, np.where(valid[chosen], 1.0, np.nan))
+    return {
+        'pairs': [(columns[int(i)], columns[int(j)], float(r), int(n)) for r, i, j, n in best],
+        'strength': {columns[i]: float(strength[i]) for i in range(k) if not np.isnan(strength[i])},
+        'columns': [columns[i] for i in chosen],
+        'matrix': matrix,
+    }
+
+def correlation_from_matrix(corr, n, columns, top_k=CORRELATION_TOP_K, matrix_columns=CORRELATION_MATRIX_COLUMNS):
+    """correlate()'s pairs, strength and compact matrix from a dense k x k matrix and its pair counts."""
+    k = len(columns)
+    upper = np.where(np.triu(np.ones((k, k), dtype=bool), 1), corr, np.nan)
+    magnitude = np.abs(upper)
+    strength = np.fmax(np.fmax.reduce(magnitude, axis=1, initial=np.nan),
+                       np.fmax.reduce(magnitude, axis=0, initial=np.nan))
+    ii, jj = np.nonzero(~np.isnan(upper))
+    best = np.argsort(-magnitude[ii, jj], kind='stable')[:top_k]
+    order = [i for i in np.argsort(-np.nan_to_num(strength, nan=-1.0), kind='stable')][:matrix_columns]
+    chosen = sorted(order)
+    return {
+        'pairs': [(columns[ii[p]], columns[jj[p]], float(upper[ii[p], jj[p]]), int(n[ii[p], jj[p]])) for p in best],
+        'strength': {columns[i]: float(strength[i]) for i in range(k) if not np.isnan(strength[i])},
+        'columns': [columns[i] for i in chosen],
+        'matrix': corr[np.ix_(chosen, chosen)],
+    }
+
+def correlation_matrix_dict(correlation):
+    """Nested {column: {column: r}} dict of correlate()'s compact matrix, like DataFrame.corr().to_dict()."""
+    columns, matrix = correlation['columns'], correlation['matrix']
+    return {a: {b: float(matrix[j, i]) for j, b in enumerate(columns)} for i, a in enumerate(columns)}
+
+class MomentSketch:
+    """Mergeable pairwise moments (Chan et al.) for count/mean/variance/min/max and Pearson correlation.
+
+    Entry [i, j] of each matrix holds the statistics of column i over rows where columns i and j
+    are both present, so the diagonal gives the per-column moments and memory is O(columns**2).
+    """
+
+    def __init__(self, k):
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.cov = np.zeros((k, k))
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+
+    def update(self, values):
+        if len(values) == 0:
+            return  # A header-only CSV streams one empty chunk
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # Center on the chunk means so the sums below stay numerically well-conditioned
+            shift = np.nan_to_num(np.nanmean(np.where(present.any(axis=0), values, 0.0), axis=0))
+            centered = np.where(present, values - shift, 0.0)
+            weight = present.astype(float)
+            n = weight.T @ weight
+            total = centered.T @ weight
+            chunk = MomentSketch(len(shift))
+            chunk.n = n
+            chunk.mean = np.where(n > 0, shift[:, None] + total / n, 0.0)
+            chunk.m2 = np.where(n > 0, (centered ** 2).T @ weight - total ** 2 / n, 0.0)
+            chunk.cov = np.where(n > 0, centered.T @ centered - total * total.T / n, 0.0)
+        chunk.min = np.where(present.any(axis=0), np.nanmin(np.where(present, values, np.inf), axis=0), np.inf)
+        chunk.max = np.where(present.any(axis=0), np.nanmax(np.where(present, values, -np.inf), axis=0), -np.inf)
+        self.merge(chunk)
+
+    def merge(self, other):
+        n = self.n + other.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            factor = np.where(n > 0, self.n * other.n / n, 0.0)
+            delta = other.mean - self.mean
+            self.mean = np.where(n > 0, self.mean + delta * np.where(n > 0, other.n / n, 0.0), 0.0)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * factor
+        self.cov = self.cov + other.cov + delta * delta.T * factor
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.cov / np.sqrt(self.m2 * self.m2.T)
+        corr[self.n < 2] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+class QuantileSketch:
+    """Mergeable KLL-style quantile sketch: items at level h stand for 2**h input values."""
+
+    def __init__(self, capacity=QUANTILE_SKETCH_CAPACITY, seed=0):
+        self.capacity = capacity
+        self.levels = []
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        self._add(0, np.asarray(values, dtype=float))
+
+    def merge(self, other):
+        for level, items in enumerate(other.levels):
+            self._add(level, items)
+
+    def _add(self, level, items):
+        while len(items):
+            if len(self.levels) <= level:
+                self.levels.append(np.empty(0))
+            items = np.concatenate([self.levels[level], items])
+            if len(items) <= self.capacity:
+                self.levels[level] = items
+                return
+            # Compact: keep every other sorted item (random offset) at twice the weight
+            items.sort()
+            self.levels[level], items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+            items = items[self.rng.integers(2)::2]
+            level += 1
+
+    def quantile(self, q):
+        items = np.concatenate(self.levels) if self.levels else np.empty(0)
+        if not len(items):
+            return np.nan
+        weights = np.concatenate([np.full(len(items), 2.0 ** h) for h, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(items[order][min(index, len(items) - 1)])
+
+class DistinctSketch:
+    """HyperLogLog approximate distinct counter over hashed values."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # rank = position of the leftmost 1-bit in the remaining 64 - p bits
+        bits = np.zeros(len(rest), dtype=np.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            high = rest >> np.uint64(shift)
+            found = high > 0
+            bits[found] += shift
+            rest = np.where(found, high, rest)
+        bits += (rest > 0).astype(np.uint8)
+        np.maximum.at(self.registers, index, (64 - self.precision - bits + 1).astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(2.0 ** -self.registers.astype(float))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # Linear counting for small cardinalities
+        return int(round(estimate))
+
+class TopValueSketch:
+    """Misra-Gries heavy hitters: approximate most frequent value and a lower bound on its count."""
+
+    def __init__(self, capacity=HEAVY_HITTERS):
+        self.capacity = capacity
+        self.counts = {}
+
+    def update(self, values):
+        other = TopValueSketch(self.capacity)
+        other.counts = pd.Series(values).value_counts().to_dict()
+        self.merge(other)
+
+    def merge(self, other):
+        counts = dict(self.counts)
+        for value, count in other.counts.items():
+            counts[value] = counts.get(value, 0) + count
+        if len(counts) > self.capacity:
+            threshold = sorted(counts.values(), reverse=True)[self.capacity]
+            counts = {value: count - threshold for value, count in counts.items() if count > threshold}
+        self.counts = counts
+
+    def top(self):
+        if not self.counts:
+            return np.nan, np.nan
+        value = max(self.counts, key=self.counts.get)
+        return value, self.counts[value]
+
+def _bottom_k(sample, sample_keys, chunk, keys, k):
+    """Merge a chunk into the k rows with the smallest random keys: a uniform sample without replacement."""
+    if len(sample_keys) >= k:
+        keep = keys < sample_keys.max()
+        chunk, keys = chunk[keep], keys[keep]
+    merged = pd.concat([sample, chunk], ignore_index=True)
+    merged_keys = np.concatenate([sample_keys, keys])
+    order = np.argsort(merged_keys)[:k]
+    return merged.iloc[order].reset_index(drop=True), merged_keys[order]
+
+def _stream_pass(file_path, encoding, chunksize, sample_rows, seed=0, columns=None):
+    """Fold every chunk of the CSV into the mergeable sketches and a bottom-k row sample."""
+    rng = np.random.default_rng(seed)
+    state = None
+    for chunk in pd.read_csv(file_path, encoding=encoding, chunksize=chunksize, usecols=columns):
+        if state is None:
+            # The first chunk fixes the schema: numeric columns stay numeric, later stray text becomes NaN
+            numeric = list(chunk.select_dtypes(include=['number']).columns)
+            categorical = [column for column in chunk.columns if column not in numeric]
+            state = {
+                'rows': 0,
+                'columns': list(chunk.columns),
+                'numeric': numeric,
+                'categorical': categorical,
+                'moments': MomentSketch(len(numeric)),
+                'missing': dict.fromkeys(chunk.columns, 0),
+                'quantiles': {column: QuantileSketch(seed=seed) for column in numeric},
+                'distinct': {column: DistinctSketch() for column in categorical},
+                'top': {column: TopValueSketch() for column in categorical},
+                'sample': chunk.iloc[:0],
+                'sample_keys': np.empty(0),
+            }
+        state['rows'] += len(chunk)
+        for column, count in chunk.isnull().sum().items():
+            state['missing'][column] += int(count)
+        values = chunk[state['numeric']].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        state['moments'].update(values)
+        for i, column in enumerate(state['numeric']):
+            state['quantiles'][column].update(values[~np.isnan(values[:, i]), i])
+        for column in state['categorical']:
+            present = chunk[column].dropna()
+            state['distinct'][column].update(present.astype(str))
+            state['top'][column].update(present)
+
+        state['sample'], state['sample_keys'] = _bottom_k(state['sample'], state['sample_keys'], chunk,
+                                                          rng.random(len(chunk)), sample_rows)
+
+    if state is None:
+        raise ValueError(f"{file_path} has no rows")
+    return state
+
+@traced('stream')
+def analyze_stream(file_path, chunksize=STREAM_CHUNKSIZE, sample_rows=STREAM_SAMPLE_ROWS, columns=None):
+    """Compute analyze_data's statistics in one chunked pass, returning (analysis, uniform row sample).
+
+    Memory is O(columns**2) for the moments plus fixed-size sketches, independent of the row count.
+    Quantiles, distinct counts and top values are approximate.
+    """
+    try:
+        encoding = detect_encoding(file_path)
+        try:
+            state = _stream_pass(file_path, encoding, chunksize, sample_rows, columns=columns)
+        except UnicodeDecodeError:
+            state = _stream_pass(file_path, _fallback_encoding(file_path), chunksize, sample_rows, columns=columns)
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        sys.exit(1)
+
+    numeric, categorical, moments = state['numeric'], state['categorical'], state['moments']
+    stats = (['count'] + (['unique', 'top', 'freq'] if categorical else [])
+             + (['mean', 'std', 'min', '25%', '50%', '75%', 'max'] if numeric else []))
+    summary = {column: dict.fromkeys(stats, np.nan) for column in state['columns']}
+    for i, column in enumerate(numeric):
+        n = moments.n[i, i]
+        quantiles = state['quantiles'][column]
+        summary[column].update({
+            'count': float(n),
+            'mean': float(moments.mean[i, i]) if n else np.nan,
+            'std': float(np.sqrt(moments.m2[i, i] / (n - 1))) if n > 1 else np.nan,
+            'min': float(moments.min[i]) if n else np.nan,
+            '25%': quantiles.quantile(0.25),
+            '50%': quantiles.quantile(0.5),
+            '75%': quantiles.quantile(0.75),
+            'max': float(moments.max[i]) if n else np.nan,
+        })
+    for column in categorical:
+        value, freq = state['top'][column].top()
+        summary[column].update({
+            'count': state['rows'] - state['missing'][column],
+            'unique': state['distinct'][column].count(),
+            'top': value,
+            'freq': freq,
+        })
+    correlation = correlation_from_matrix(moments.correlation(), moments.n, numeric)
+    analysis = {
+        'summary': summary,
+        'missing_values': state['missing'],
+        'correlation': correlation_matrix_dict(correlation),
+        'correlation_pairs': [[a, b, r] for a, b, r, _ in correlation['pairs']],
+        # Sketched statistics: Misra-Gries can report the wrong top value, and its count never exceeds the true one
+        'approximate': {'unique': 'approximate', 'top': 'approximate', 'freq': 'lower bound'},
+    }
+    return analysis, state['sample']
+
+def _sample_pass(file_path, encoding, chunksize, sample_rows, fraction, seed, columns):
+    rng = np.random.default_rng(seed)
+    sample, keys, rows, kept = None, np.empty(0), 0, []
+    for chunk in pd.read_csv(file_path, encoding=encoding, chunksize=chunksize, usecols=columns):
+        rows += len(chunk)
+        if sample is None:
+            sample = chunk.iloc[:0]
+        if fraction is not None:
+            # Bernoulli sampling: each row is kept independently, so the sample grows with the file
+            kept.append(chunk[rng.random(len(chunk)) < fraction])
+        else:
+            sample, keys = _bottom_k(sample, keys, chunk, rng.random(len(chunk)), sample_rows)
+    if sample is None:
+        raise ValueError(f"{file_path} has no rows")
+    if fraction is not None:
+        sample = pd.concat([sample, *kept], ignore_index=True)
+    return sample, rows
+
+@traced('sample')
+def sample_csv(file_path, sample_rows=None, fraction=None, chunksize=STREAM_CHUNKSIZE, seed=0, columns=None):
+    """Draw a uniform row sample in one chunked pass, returning (sample, total rows in the file).
+
+    With `sample_rows` this is a fixed-size bottom-k reservoir; with `fraction` each row is kept
+    with that probability.
+    """
+    try:
+        try:
+            return _sample_pass(file_path, detect_encoding(file_path), chunksize, sample_rows, fraction, seed,
+                                columns)
+        except UnicodeDecodeError:
+            return _sample_pass(file_path, _fallback_encoding(file_path), chunksize, sample_rows, fraction, seed,
+                                columns)
+    except Exception as e:
+        print(f"Error loading file: {e}")
+        sys.exit(1)
+
+@traced('sample_confidence')
+def sample_confidence(df, population_rows, confidence=SAMPLE_CONFIDENCE, method='pearson'):
+    """Confidence intervals for the means, quartiles and correlations estimated from a uniform sample.
+
+    Means use the normal approximation with a finite-population correction, quartiles the
+    distribution-free order-statistic interval, and correlations the Fisher z-transform (which assumes
+    roughly bivariate-normal data and is optimistic for heavy tails).
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    numeric = df.select_dtypes(include=['number'])
+    sample_rows = len(df)
+    correction = np.sqrt(max(0.0, 1 - sample_rows / population_rows)) if population_rows else 1.0
+    means, quantiles = {}, {}
+    for column in numeric.columns:
+        values = np.sort(numeric[column].to_numpy(dtype=float, na_value=np.nan))
+        values = values[~np.isnan(values)]
+        n = len(values)
+        if n < 2:
+            continue
+        half_width = z * values.std(ddof=1) / np.sqrt(n) * correction
+        means[column] = [float(values.mean() - half_width), float(values.mean() + half_width)]
+        quantiles[column] = {}
+        for q in (0.25, 0.5, 0.75):
+            spread = z * np.sqrt(n * q * (1 - q))
+            low = int(np.clip(np.floor(n * q - spread), 0, n - 1))
+            high = int(np.clip(np.ceil(n * q + spread), 0, n - 1))
+            quantiles[column][f'{q:.0%}'] = [float(values[low]), float(values[high])]
+
+    # Intervals for the strongest pairs, the ones the narrative sees. Spearman's z has a wider variance (Fieller).
+    correlations = {}
+    variance = 1.06 if method == 'spearman' else 1.0
+    for a, b, r, n in correlate(numeric, method=method, matrix_columns=0)['pairs']:
+        if n <= 3:
+            continue
+        center, spread = np.arctanh(np.clip(r, -0.999999, 0.999999)), z * np.sqrt(variance / (n - 3))
+        correlations.setdefault(a, {})[b] = [float(np.tanh(center - spread)), float(np.tanh(center + spread))]
+    return {
+        'sample_rows': sample_rows,
+        'population_rows': int(population_rows),
+        'confidence': confidence,
+        'mean_ci': means,
+        'quantile_ci': quantiles,
+        'correlation_ci': correlations,
+    }
+
+@traced('distributions')
+def compute_distributions(df, bins=HISTOGRAM_BINS, grid_size=KDE_GRID_SIZE):
+    """Histogram, skewness and Gaussian KDE for every numeric column in one batched NumPy pass.
+
+    The KDE linearly bins each column onto a fixed grid and convolves it with the kernel by FFT,
+    so its cost is O(grid) per column rather than O(rows * grid). Bandwidths follow Scott's rule,
+    matching the scipy/seaborn default.
+    """
+    columns = list(df.select_dtypes(include=['number']).columns)
+    values = df[columns].to_numpy(dtype=float, na_value=np.nan)
+    present = np.isfinite(values)  # Infinities would stretch the bin range to NaN, so they count as missing
+    k = len(columns)
+    n = present.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # initial= keeps the reductions defined on zero-row frames
+        lo = np.where(n > 0, np.where(present, values, np.inf).min(axis=0, initial=np.inf), 0.0)
+        hi = np.where(n > 0, np.where(present, values, -np.inf).max(axis=0, initial=-np.inf), 1.0)
+        flat = hi <= lo
+        lo, hi = np.where(flat, lo - 0.5, lo), np.where(flat, hi + 0.5, hi)
+        scaled = np.where(present, (values - lo) / (hi - lo), 0.0)
+
+        # Histograms of all columns via one bincount over (column, bin) ids
+        column_offset = np.arange(k)
+        bin_ids = np.clip((scaled * bins).astype(int), 0, bins - 1) + column_offset * bins
+        counts = np.bincount(bin_ids[present], minlength=k * bins).reshape(k, bins)
+
+        # Linear binning of all columns onto the KDE grid
+        position = scaled * (grid_size - 1)
+        left = np.clip(np.floor(position), 0, grid_size - 2)
+        right_weight = (position - left)[present]
+        grid_ids = (left.astype(int) + column_offset * grid_size)[present]
+        binned = (np.bincount(grid_ids, weights=1 - right_weight, minlength=k * grid_size)
+                  + np.bincount(grid_ids + 1, weights=right_weight, minlength=k * grid_size)).reshape(k, grid_size)
+
+        mean = np.where(present, values, 0.0).sum(axis=0) / n
+        centered = np.where(present, values - mean, 0.0)
+        m2 = (centered ** 2).sum(axis=0)
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * ((centered ** 3).sum(axis=0) / n) / (m2 / n) ** 1.5
+        bandwidth = np.sqrt(m2 / (n - 1)) * n ** (-1 / 5)
+
+        # Circular FFT convolution on a grid padded to 2x so the kernel never wraps into the data
+        step = (hi - lo) / (grid_size - 1)
+        size = 1 << int(np.ceil(np.log2(2 * grid_size)))
+        offsets = np.fft.fftfreq(size, 1 / size)
+        kernel = np.exp(-0.5 * (offsets / (bandwidth / step)[:, None]) ** 2)
+        kernel /= kernel.sum(axis=1, keepdims=True)
+        density = np.fft.irfft(np.fft.rfft(binned, n=size) * np.fft.rfft(kernel, n=size), n=size)[:, :grid_size]
+        density = np.clip(density, 0, None) / (n * step)[:, None]
+
+    distributions = {}
+    for i, column in enumerate(columns):
+        valid_kde = n[i] > 1 and bandwidth[i] > 0 and np.isfinite(density[i]).all()
+        distributions[column] = {
+            'count': int(n[i]),
+            'bin_edges': np.linspace(lo[i], hi[i], bins + 1),
+            'counts': counts[i],
+            'skew': float(skew[i]) if n[i] > 2 and m2[i] > 0 else np.nan,
+            'grid': np.linspace(lo[i], hi[i], grid_size),
+            'density': density[i] if valid_kde else None,
+        }
+    return distributions
+
+def _round_sig(value, digits=4):
+    return float(f'{value:.{digits}g}')
+
+def describe_distributions(distributions):
+    """Compact, JSON-friendly view of compute_distributions() for the analysis dict."""
+    described = {}
+    for column, dist in distributions.items():
+        edges = dist['bin_edges']
+        centers = (edges[:-1] + edges[1:]) / 2
+        entry = {
+            'bin_edges': [_round_sig(edge) for edge in edges],
+            'counts': [int(count) for count in dist['counts']],
+            'skew': round(dist['skew'], 3) if np.isfinite(dist['skew']) else None,
+        }
+        if dist['density'] is not None:
+            density = dist['density']
+            # Local maxima above 5% of the peak height count as modes
+            inner = density[1:-1]
+            peaks = (inner > density[:-2]) & (inner >= density[2:]) & (inner > 0.05 * density.max())
+            entry['density'] = [_round_sig(value) for value in np.interp(centers, dist['grid'], density)]
+            entry['modes'] = [_round_sig(value) for value in dist['grid'][1:-1][peaks]]
+        described[column] = entry
+    return described
+
+def _chi2_quantile(dof, p):
+    """Wilson-Hilferty approximation of the chi-square quantile, accurate to ~1% for dof >= 2."""
+    z = NormalDist().inv_cdf(p)
+    return dof * (1 - 2 / (9 * dof) + z * np.sqrt(2 / (9 * dof))) ** 3
+
+def _row_label_column(df):
+    """The text column that best identifies a row: the one with the most distinct values."""
+    text = [column for column in df.columns if column not in df.select_dtypes(include=['number']).columns]
+    return max(text, key=lambda column: df[column].nunique(), default=None)
+
+def fit_outlier_model(df, row_budget=OUTLIER_ROW_BUDGET, seed=0):
+    """Robust location/scale per numeric column and an inverse covariance of the robust z-scores.
+
+    Fitted on at most row_budget sampled rows. Scale is the MAD (times 1.4826, so it matches the
+    standard deviation for normal data), falling back to IQR / 1.349 and then the standard deviation
+    when most values are tied. The covariance is refitted once without the 5% most distant rows,
+    so a few extreme rows do not hide themselves.
+    """
+    columns = list(df.select_dtypes(include=['number']).columns)
+    if not columns:
+        empty = np.empty(0)
+        return {'columns': [], 'median': empty, 'scale': empty, 'lower_fence': empty, 'upper_fence': empty,
+                'fit_rows': 0, 'precision': None}
+    sample = df[columns].sample(row_budget, random_state=seed) if len(df) > row_budget else df[columns]
+    values = sample.to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN columns
+        median = np.nanmedian(values, axis=0)
+        q1, q3 = np.nanpercentile(values, [25, 75], axis=0)
+        scale = 1.4826 * np.nanmedian(np.abs(values - median), axis=0)
+        scale = np.where(scale > 0, scale, (q3 - q1) / 1.349)
+        scale = np.where(scale > 0, scale, np.nanstd(values, axis=0))
+    valid = np.isfinite(scale) & (scale > 0)
+    model = {
+        'columns': [c for c, ok in zip(columns, valid) if ok],
+        'median': median[valid], 'scale': scale[valid],
+        # Tukey fences are meaningless when most values tie (IQR of 0), so they are left as NaN
+        'lower_fence': np.where(q3 > q1, q1 - 1.5 * (q3 - q1), np.nan)[valid],
+        'upper_fence': np.where(q3 > q1, q3 + 1.5 * (q3 - q1), np.nan)[valid],
+        'fit_rows': len(sample), 'precision': None,
+    }
+    if len(model['columns']) >= 2:
+        z = np.nan_to_num((values[:, valid] - model['median']) / model['scale'])
+        precision = np.linalg.pinv(np.cov(z, rowvar=False))
+        distance = np.einsum('ij,jk,ik->i', z, precision, z)
+        core = z[distance <= np.quantile(distance, 0.95)]
+        if len(core) > len(model['columns']):
+            precision = np.linalg.pinv(np.cov(core, rowvar=False))
+        model['precision'] = precision
+    return model
+
+def score_outliers(df, model, chunk_rows=OUTLIER_CHUNK_ROWS):
+    """Yield (row positions, robust z-scores, squared Mahalanobis distances or None) chunk by chunk."""
+    for start in range(0, len(df), chunk_rows):
+        values = df[model['columns']].iloc[start:start + chunk_rows].to_numpy(dtype=float, na_value=np.nan)
+        z = (values - model['median']) / model['scale']
+        distance = None
+        if model['precision'] is not None:
+            filled = np.nan_to_num(z)  # A missing value sits at the median
+            distance = np.einsum('ij,jk,ik->i', filled, model['precision'], filled)
+        yield np.arange(start, start + len(values)), z, distance
+
+@traced('outliers')
+def detect_outliers(df, row_budget=OUTLIER_ROW_BUDGET, top_k=OUTLIER_TOP_ROWS, chunk_rows=OUTLIER_CHUNK_ROWS,
+                    z_threshold=OUTLIER_Z):
+    """Per-column robust z-score and IQR outlier counts plus multivariate (Mahalanobis) anomalies.
+
+    The model is fitted on a bounded sample and every row is scored in vectorized chunks, so memory
+    stays O(chunk_rows * columns). Returns a JSON-friendly summary with the top_k most anomalous rows.
+    """
+    model = fit_outlier_model(df, row_budget)
+    columns = model['columns']
+    if not columns:
+        return {}
+    z_count = np.zeros(len(columns), dtype=int)
+    fence_count = np.zeros(len(columns), dtype=int)
+    threshold = _chi2_quantile(len(columns), 0.999) if model['precision'] is not None else None
+    multivariate = 0
+    best = np.empty((0, 2))  # squared distance (or max |z|), row position
+    for rows, z, distance in score_outliers(df, model, chunk_rows):
+        with np.errstate(invalid='ignore'):
+            z_count += (np.abs(z) > z_threshold).sum(axis=0)
+            values = z * model['scale'] + model['median']
+            fence_count += ((values < model['lower_fence']) | (values > model['upper_fence'])).sum(axis=0)
+        if distance is None:
+            distance = np.abs(np.nan_to_num(z)).max(axis=1)
+        else:
+            multivariate += int((distance > threshold).sum())
+        best = np.concatenate([best, np.column_stack([distance, rows])])
+        if len(best) > top_k:
+            best = best[np.argpartition(-best[:, 0], top_k)[:top_k]]
+    best = best[np.argsort(-best[:, 0])]
+
+    label_column = _row_label_column(df)
+    top_rows = []
+    for score, position in best:
+        position = int(position)
+        values = df[columns].iloc[position].to_numpy(dtype=float, na_value=np.nan)
+        z = (values - model['median']) / model['scale']
+        unusual = np.argsort(-np.nan_to_num(np.abs(z)))[:3]
+        top_rows.append({
+            'row': position,
+            'label': None if label_column is None else _fmt(df[label_column].iloc[position]),
+            'distance': _round_sig(np.sqrt(score) if model['precision'] is not None else score),
+            'values': {columns[i]: [_round_sig(values[i]), round(float(z[i]), 1)]
+                       for i in unusual if np.isfinite(z[i])},
+        })
+    has_fences = ~np.isnan(model['lower_fence'])
+    return {
+        'rows_scored': len(df),
+        'fit_rows': model['fit_rows'],
+        'columns': {
+            column: {
+                'median': _round_sig(model['median'][i]),
+                'robust_scale': _round_sig(model['scale'][i]),
+                'lower_fence': _round_sig(model['lower_fence'][i]) if has_fences[i] else None,
+                'upper_fence': _round_sig(model['upper_fence'][i]) if has_fences[i] else None,
+                'z_outliers': int(z_count[i]),
+                'iqr_outliers': int(fence_count[i]) if has_fences[i] else None,
+            }
+            for i, column in enumerate(columns)
+        },
+        'multivariate': None if threshold is None else {
+            'columns': len(columns),
+            'distance_threshold': _round_sig(np.sqrt(threshold)),
+            'outliers': multivariate,
+        },
+        'top_rows': top_rows,
+    }
+
+def rank_columns(df, columns):
+    """Order numeric columns by their strongest absolute correlation with another column, then variance."""
+    columns = list(columns)
+    found = correlate(df[columns], top_k=0, matrix_columns=0)['strength']
+    strength = np.array([found.get(column, -1.0) for column in columns])
+    variance = df[columns].var().fillna(-1.0).to_numpy()
+    order = np.lexsort((-variance, -strength))
+    return [columns[i] for i in order]
+
+def plan_plots(df, output_dir, pairplot_columns=PAIRPLOT_MAX_COLUMNS, row_budget=PLOT_ROW_BUDGET,
+               heatmap_columns=CORRELATION_MATRIX_COLUMNS, outlier_chart=True):
+    """List every chart to render exactly once: a histogram per numeric column, a capped pairplot and heatmap,
+    and an outlier overlay."""
     numeric_columns = df.select_dtypes(include=['number']).columns
-    
-    for column in numeric_columns:
+    plan = [PlotSpec('histogram', [column], os.path.join(output_dir, f'{column}_distribution.png'))
+            for column in numeric_columns]
+    sample = df.sample(row_budget, random_state=0) if len(df) > row_budget else df
+    if len(numeric_columns) > 1 and max(pairplot_columns, heatmap_columns) > 1:
+        ranked = rank_columns(sample, numeric_columns)
+        if pairplot_columns > 1:
+            plan.append(PlotSpec('pairplot', ranked[:pairplot_columns], os.path.join(output_dir, 'pairplot.png')))
+        if heatmap_columns > 1:
+            # Keep the original column order so related columns stay adjacent, as in the data
+            top_columns = [column for column in numeric_columns if column in ranked[:heatmap_columns]]
+            plan.append(PlotSpec('heatmap', top_columns, os.path.join(output_dir, 'correlation_heatmap.png')))
+    if len(numeric_columns) > 1 and outlier_chart:
+        # Outliers against the strongest relationship stand out as points off the trend
+        pairs = correlate(sample[numeric_columns], top_k=1, matrix_columns=0)['pairs']
+        if pairs:
+            plan.append(PlotSpec('outliers', list(pairs[0][:2]), os.path.join(output_dir, 'outliers.png')))
+    return plan
+
+def _pyplot():
+    """Import pyplot on first use, with the non-interactive backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def prewarm_fonts():
+    """Build matplotlib's font cache and draw a throwaway chart, so the first real run starts warm."""
+    plt = _pyplot()
+    import seaborn as sns
+    from matplotlib import font_manager
+    font_manager.findfont(font_manager.FontProperties(family=plt.rcParams['font.family']))
+    sns.set(style="whitegrid")
+    figure = plt.figure()
+    plt.plot([0, 1], [0, 1])
+    plt.title('Warm-up')
+    figure.savefig(os.devnull, format='png')
+    plt.close(figure)
+
+def render_plot(df, spec, row_budget=PLOT_ROW_BUDGET, distribution=None, outlier_rows=OUTLIER_ROW_BUDGET):
+    """Render a single planned chart to its path."""
+    plt = _pyplot()
+    if spec.kind == 'histogram':
+        # Plot the precomputed histogram with its KDE, scaled from density to counts per bin
+        column = spec.columns[0]
+        if distribution is None:
+            distribution = compute_distributions(df[[column]])[column]
+        edges = distribution['bin_edges']
+        plt.figure()
+        plt.stairs(distribution['counts'], edges, fill=True, color='blue', alpha=0.4)
+        plt.stairs(distribution['counts'], edges, color='white', linewidth=0.8)
+        if distribution['density'] is not None:
+            scale = distribution['count'] * (edges[1] - edges[0])
+            plt.plot(distribution['grid'], distribution['density'] * scale, color='blue')
+        plt.title(f'Distribution of {column}')
+        plt.xlabel(column)
+        plt.ylabel('Frequency')
+        plt.savefig(spec.path)
+        plt.close()
+    elif spec.kind == 'pairplot':
+        # Pairplot for correlation exploration, on a row sample so scatter panels stay cheap
+        data = df[spec.columns]
+        if len(data) > row_budget:
+            data = data.sample(row_budget, random_state=0)
+        import seaborn as sns
+        grid = sns.pairplot(data)
+        grid.savefig(spec.path)
+        plt.close(grid.figure)
+    elif spec.kind == 'outliers':
+        # Every row is scored against a model fit on the same outlier_rows sample as detect_outliers;
+        # at most row_budget inliers and row_budget outliers are drawn
+        x, y = spec.columns
+        data = df[spec.columns]
+        model = fit_outlier_model(data, outlier_rows)
+        if model['precision'] is None:
+            raise ValueError(f"{x} and {y} have no spread to score outliers on")
+        distance = np.concatenate([chunk for _, _, chunk in score_outliers(data, model)])
+        outlying = distance > _chi2_quantile(2, 0.999)
+        rng = np.random.default_rng(0)
+        plt.figure(figsize=(8, 6))
+        for points, style in ((~outlying, {'color': 'grey', 'alpha': 0.3, 's': 8, 'label': 'typical'}),
+                              (outlying, {'color': 'red', 'alpha': 0.8, 's': 16, 'label': 'outlier (p < 0.001)'})):
+            rows = np.flatnonzero(points)
+            if len(rows) > row_budget:
+                rows = rng.choice(rows, row_budget, replace=False)
+            plt.scatter(data[x].iloc[rows], data[y].iloc[rows], **style)
+        for row in np.argsort(-np.nan_to_num(distance))[:5]:
+            plt.annotate(str(data.index[row]), (data[x].iloc[row], data[y].iloc[row]), fontsize=7,
+                         xytext=(3, 3), textcoords='offset points')
+        plt.title(f'Outliers in {x} vs {y} ({outlying.sum()} of {len(data)} rows)')
+        plt.xlabel(x)
+        plt.ylabel(y)
+        plt.legend()
+        plt.tight_layout()
+        plt.savefig(spec.path)
+        plt.close()
+    elif spec.kind == 'heatmap':
+        # Correlations of the planned columns only, through the same engine as the analysis
+        import seaborn as sns
+        correlation = correlate(df[spec.columns], top_k=0, matrix_columns=len(spec.columns))
+        matrix = pd.DataFrame(correlation['matrix'], index=correlation['columns'], columns=correlation['columns'])
+        plt.figure(figsize=(8, 6.5))
+        sns.heatmap(matrix, annot=len(spec.columns) <= 12, fmt='.2f', cmap='coolwarm', vmin=-1, vmax=1,
+                    square=True, annot_kws={'size': 7})
+        plt.title('Correlation matrix')
+        plt.tight_layout()
+        plt.savefig(spec.path)
+        plt.close()
+    else:
+        raise ValueError(f"Unknown plot kind: {spec.kind}")
+
+def _render_timed(df, spec, row_budget, distribution=None, parent=None, outlier_rows=OUTLIER_ROW_BUDGET):
+    """Render one chart, returning (error message or None, elapsed seconds)."""
+    start = time.perf_counter()
+    with trace_span('plot', parent, kind=spec.kind, chart=os.path.basename(spec.path)) as span:
         try:
-            # Plot histogram with KDE
-            plt.figure()
-            sns.histplot(df[column].dropna(), kde=True, color='blue', bins=30)
-            plt.title(f'Distribution of {column}')
-            plt.xlabel(column)
-            plt.ylabel('Frequency')
-            plot_path = os.path.join(output_dir, f'{column}_distribution.png')
-            plt.savefig(plot_path)
-            plt.close()
-
-            # Pairplot for correlation exploration (optional for large datasets)
-            if len(numeric_columns) > 1:
-                pairplot_path = os.path.join(output_dir, 'pairplot.png')
-                sns.pairplot(df[numeric_columns])
-                plt.savefig(pairplot_path)
-                plt.close()
+            render_plot(df, spec, row_budget, distribution, outlier_rows)
+            return None, time.perf_counter() - start
         except Exception as e:
-            print(f"Error generating visualization for {column}: {e}")
+            _pyplot().close('all')
+            span.set(failed=str(e))
+            return str(e), time.perf_counter() - start
 
-def generate_narrative(analysis):
-    """Generate narrative using LLM."""
-    headers = {
-        'Authorization': f'Bearer {AIPROXY_TOKEN}',
-        'Content-Type': 'application/json'
-    }
-    prompt = f"""
-You are a data analyst. Analyze the dataset dynamically based on the following analysis: {analysis}. Avoid assumptions.
+def _init_render_worker():
+    _pyplot()
+    import seaborn as sns
+    sns.set(style="whitegrid")
+
+def _render_from_buffer(spec, buffer_path, column_index, row_budget, distribution, parent=None,
+                        outlier_rows=OUTLIER_ROW_BUDGET):
+    """Process-pool task: rebuild only this chart's columns from the memory-mapped buffer and render it."""
+    if distribution is not None:
+        return _render_timed(None, spec, row_budget, distribution, parent)
+    values = np.load(buffer_path, mmap_mode='r')
+    df = pd.DataFrame({column: values[column_index[column]] for column in spec.columns})
+    return _render_timed(df, spec, row_budget, parent=parent, outlier_rows=outlier_rows)
+
+def _render_parallel(df, plan, row_budget, jobs, distributions, outlier_rows=OUTLIER_ROW_BUDGET):
+    """Render the plan in a process pool, yielding (error, elapsed) per chart in plan order.
+
+    Histograms only receive their small precomputed arrays. Columns needed by the other charts are
+    written once to a column-major .npy file that workers memory-map, so no task pickles the DataFrame.
+    """
+    columns = list(dict.fromkeys(column for spec in plan if spec.kind != 'histogram' for column in spec.columns))
+    column_index = {column: i for i, column in enumerate(columns)}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        buffer_path = os.path.join(tmp_dir, 'columns.npy')
+        buffer = np.lib.format.open_memmap(buffer_path, mode='w+', dtype=float, shape=(len(columns), len(df)))
+        for column, i in column_index.items():
+            buffer[i] = df[column].to_numpy(dtype=float, na_value=np.nan)
+        buffer.flush()
+        del buffer
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_render_worker) as pool:
+            futures = [pool.submit(_render_from_buffer, spec, buffer_path, column_index, row_budget,
+                                   _histogram_data(spec, distributions), trace_context(), outlier_rows)
+                       for spec in plan]
+            for future in futures:
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield str(e), 0.0
+
+def _histogram_data(spec, distributions):
+    return distributions.get(spec.columns[0]) if spec.kind == 'histogram' else None
+
+@traced('visualize')
+def visualize_data(df, output_dir, pairplot_columns=PAIRPLOT_MAX_COLUMNS, row_budget=PLOT_ROW_BUDGET, jobs=1,
+                   distributions=None, heatmap_columns=CORRELATION_MATRIX_COLUMNS, outlier_rows=OUTLIER_ROW_BUDGET):
+    """Generate and save visualizations, optionally across `jobs` processes.
+
+    `distributions` is the output of compute_distributions(df); it is computed here if not given.
+    `outlier_rows` is the fit budget passed to detect_outliers, so the chart matches the reported outliers.
+    Returns the PlotSpecs that rendered successfully.
+    """
+    _init_render_worker()
+    if distributions is None:
+        distributions = compute_distributions(df)
+    plan = plan_plots(df, output_dir, pairplot_columns, row_budget, heatmap_columns)
+    if jobs > 1 and len(plan) > 1:
+        results = _render_parallel(df, plan, row_budget, jobs, distributions, outlier_rows)
+    else:
+        results = (_render_timed(df, spec, row_budget, _histogram_data(spec, distributions), outlier_rows=outlier_rows)
+                   for spec in plan)
+    rendered = []
+    for spec, (error, elapsed) in zip(plan, results):
+        if error:
+            print(f"Error generating visualization for {', '.join(map(str, spec.columns))}: {error}")
+        else:
+            print(f"Rendered {os.path.basename(spec.path)} in {elapsed:.2f}s")
+            rendered.append(spec)
+    return rendered
+
+def _llm_cache_db():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    db = sqlite3.connect(os.path.join(CACHE_DIR, 'llm.sqlite'), timeout=30)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('CREATE TABLE IF NOT EXISTS responses '
+               '(key TEXT PRIMARY KEY, response TEXT, size INTEGER, created REAL, accessed REAL)')
+    return db
+
+def llm_cache_key(data):
+    """Hash of the request fields that determine the response."""
+    keyed = {key: data.get(key) for key in ('model', 'messages', 'response_format', 'temperature')}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+class TokenBucket:
+    """Async token bucket holding one minute of capacity, refilled continuously."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount=1.0):
+        if self.per_minute <= 0:
+            return
+        amount = min(amount, self.per_minute)
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * self.per_minute / 60)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) * 60 / self.per_minute)
+
+    def adjust(self, amount):
+        """Charge (or refund) the difference once the real usage is known."""
+        if self.per_minute > 0:
+            self.tokens -= amount
+
+class LLMClient:
+    """Pooled async chat-completion client with RPM/TPM rate limits and jittered exponential backoff."""
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_retries=LLM_MAX_RETRIES):
+        import httpx
+        self.http = httpx.AsyncClient(
+            http2=importlib.util.find_spec('h2') is not None,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+            headers={'Authorization': f'Bearer {os.getenv("AIPROXY_TOKEN")}', 'Content-Type': 'application/json'},
+        )
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_retries = max_retries
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.http.aclose()
+
+    @staticmethod
+    def _retry_delay(attempt, response):
+        delay = min(30.0, 2.0 ** attempt) * random.uniform(0.5, 1.0)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                delay = max(delay, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+        return delay
+
+    async def complete(self, data, timeout):
+        """POST a chat completion and return the JSON body, retrying 429/5xx/network errors."""
+        import httpx
+        estimate = estimate_message_tokens(data['messages'])
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire()
+            await self.tokens.acquire(estimate)
+            response = None
+            try:
+                with trace_span('llm_request', model=data.get('model'), attempt=attempt) as span:
+                    response = await self.http.post(API_URL, json=data, timeout=timeout)
+                    if span:
+                        usage = response.json().get('usage', {}) if response.status_code == 200 else {}
+                        span.set(status=response.status_code, request_bytes=len(response.request.content),
+                                 response_bytes=len(response.content), prompt_tokens=usage.get('prompt_tokens'),
+                                 completion_tokens=usage.get('completion_tokens'))
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    result = response.json()
+                    self.tokens.adjust(result.get('usage', {}).get('total_tokens', estimate) - estimate)
+                    return result
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            if attempt == self.max_retries:
+                response.raise_for_status()
+            delay = self._retry_delay(attempt, response)
+            status = response.status_code if response is not None else 'network error'
+            print(f"LLM request failed ({status}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+@traced('llm')
+async def cached_completion(client, data, timeout, cache_mode=None):
+    """Chat completion via client, serving repeats from an on-disk cache with TTL and size-bounded LRU eviction."""
+    cache_mode = cache_mode or LLM_CACHE_MODE
+    key = llm_cache_key(data)
+    if cache_mode == 'on':
+        with _llm_cache_db() as db:
+            row = db.execute('SELECT response FROM responses WHERE key = ? AND created >= ?',
+                             (key, time.time() - LLM_CACHE_TTL)).fetchone()
+            if row:
+                db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+                print("LLM cache hit")
+                current_span().set(cache='hit')
+                return json.loads(row[0])
+    print("LLM cache miss" if cache_mode == 'on' else f"LLM cache {cache_mode}")
+    current_span().set(cache='miss' if cache_mode == 'on' else cache_mode)
+    result = await client.complete(data, timeout)
+    if cache_mode != 'off':
+        text, now = json.dumps(result), time.time()
+        with _llm_cache_db() as db:
+            db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', (key, text, len(text), now, now))
+            db.execute('DELETE FROM responses WHERE created < ?', (now - LLM_CACHE_TTL,))
+            db.execute('DELETE FROM responses WHERE key IN (SELECT key FROM (SELECT key, SUM(size) '
+                       'OVER (ORDER BY accessed DESC) AS used FROM responses) WHERE used > ?)', (LLM_CACHE_MAX_BYTES,))
+    return result
+
+def estimate_tokens(text):
+    """Estimate the token count of text (about four characters per token)."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def estimate_message_tokens(messages):
+    """Estimate the prompt tokens of chat messages, charging images a flat IMAGE_TOKENS instead of their base64."""
+    tokens = 0
+    for message in messages:
+        parts = message['content'] if isinstance(message['content'], list) else [message['content']]
+        for part in parts:
+            is_image = isinstance(part, dict) and part.get('type') == 'image_url'
+            tokens += IMAGE_TOKENS if is_image else estimate_tokens(json.dumps(part))
+    return tokens
+
+def _fmt(value):
+    if isinstance(value, (float, np.floating)):
+        return 'NA' if not np.isfinite(value) else f'{value:.3g}'
+    text = str(value).replace('|', '/').replace('\n', ' ')
+    return text if len(text) <= 40 else text[:37] + '...'
+
+def _interval(bounds):
+    return f'{_fmt(bounds[0])} to {_fmt(bounds[1])}' if bounds else 'NA'
+
+def _markdown_table(header, rows):
+    lines = ['| ' + ' | '.join(header) + ' |', '|' + '---|' * len(header)]
+    lines += ['| ' + ' | '.join(_fmt(value) for value in row) + ' |' for row in rows]
+    return '\n'.join(lines)
+
+def prompt_sections(analysis):
+    """High-signal facts from the analysis as (title, header, rows) sections, most important rows first."""
+    summary, missing = analysis['summary'], analysis['missing_values']
+    correlation = analysis.get('correlation', {})
+    distributions = analysis.get('distributions', {})
+    sampling = analysis.get('sampling')
+    approximate = analysis.get('approximate', {})
+    rows = max((int(missing[c] + (summary[c]['count'] if pd.notna(summary[c]['count']) else 0)) for c in summary),
+               default=0)
+    numeric = [c for c in summary if pd.notna(summary[c].get('mean', np.nan))]
+    categorical = [c for c in summary if c not in numeric]
+
+    if 'correlation_pairs' in analysis:
+        pairs = [tuple(pair) for pair in analysis['correlation_pairs']]
+    else:
+        pairs = []
+        columns = list(correlation)
+        for i, a in enumerate(columns):
+            for b in columns[i + 1:]:
+                r = correlation[a].get(b, np.nan)
+                if pd.notna(r):
+                    pairs.append((a, b, r))
+    pairs.sort(key=lambda pair: -abs(pair[2]))
+    strength = {}
+    for a, b, r in pairs:
+        strength.setdefault(a, abs(r))
+        strength.setdefault(b, abs(r))
+    if sampling:
+        ci = sampling['correlation_ci']
+        pairs = [(a, b, r, _interval((ci.get(a) or {}).get(b) or (ci.get(b) or {}).get(a))) for a, b, r in pairs]
+
+    def flags(column):
+        stats = summary[column]
+        skew = (distributions.get(column) or {}).get('skew')
+        iqr = stats['75%'] - stats['25%']
+        found = []
+        if skew is not None and abs(skew) > 1:
+            found.append('right-skewed' if skew > 0 else 'left-skewed')
+        if len((distributions.get(column) or {}).get('modes', [])) > 1:
+            found.append('multimodal')
+        # Tukey far-out fences from the quartiles flag heavy tails without another pass over the data
+        if iqr > 0 and (stats['max'] > stats['75%'] + 3 * iqr or stats['min'] < stats['25%'] - 3 * iqr):
+            found.append('far outliers')
+        return skew, found
+
+    flagged = [(c, *flags(c)) for c in numeric]
+    flagged = [(c, skew, ', '.join(found)) for c, skew, found in flagged if found]
+    flagged.sort(key=lambda row: -abs(row[1] or 0))
+
+    outliers = analysis.get('outliers') or {}
+    # --stream and --sample score only the in-memory row sample, so those counts are labelled as such
+    sampled = bool(outliers) and (bool(sampling) or outliers['rows_scored'] < rows)
+    in_sample = ' in sample' if sampled else ''
+    outlier_rows = sorted(
+        ([c, stats['z_outliers'], 100 * stats['z_outliers'] / outliers['rows_scored'],
+          np.nan if stats['iqr_outliers'] is None else stats['iqr_outliers'], stats['median'], stats['robust_scale']]
+         for c, stats in outliers.get('columns', {}).items() if stats['z_outliers'] or stats['iqr_outliers']),
+        key=lambda row: (-row[1], -np.nan_to_num(row[3])))
+    anomalies = []
+    for entry in outliers.get('top_rows', []):
+        column, (value, z) = next(iter(entry['values'].items()), (None, (np.nan, np.nan)))
+        anomalies.append([entry['row'], entry['label'] or '', entry['distance'], column or '', value, z])
+
+    level = f"{sampling['confidence']:.0%} CI" if sampling else ''
+    numeric_rows = [[c, summary[c]['mean'], summary[c]['std'], summary[c]['min'], summary[c]['50%'], summary[c]['max']]
+                    for c in sorted(numeric, key=lambda c: -strength.get(c, 0))]
+    if sampling:
+        numeric_rows = [[*row, _interval(sampling['mean_ci'].get(row[0])),
+                         _interval(sampling['quantile_ci'].get(row[0], {}).get('50%'))] for row in numeric_rows]
+
+    sections = [
+        ('Strongest correlations', ['column A', 'column B', 'r'] + ([f'r {level}'] if sampling else []), pairs),
+        ('Missing values', ['column', 'missing', '% rows'],
+         sorted(([c, missing[c], 100 * missing[c] / rows] for c in summary if missing[c] and rows),
+                key=lambda row: -row[1])),
+        ('Skew and outlier flags', ['column', 'skew', 'flags'], flagged),
+        ('Outlier counts', ['column', f'robust z beyond ±{OUTLIER_Z}{in_sample}', f'% rows{in_sample}',
+                            f'IQR outliers{in_sample}', 'median', 'robust scale'], outlier_rows),
+        ('Anomalous rows', ['sample row' if sampled else 'row', 'label', 'distance', 'most unusual column', 'value',
+                            'robust z'], anomalies),
+        ('Numeric columns', ['column', 'mean', 'std', 'min', 'median', 'max']
+         + ([f'mean {level}', f'median {level}'] if sampling else []), numeric_rows),
+        ('Categorical columns (cardinality)',
+         ['column'] + [f'{stat} ({approximate[stat]})' if stat in approximate else stat
+                       for stat in ('unique', 'top', 'freq')],
+         [[c, summary[c].get('unique', np.nan), summary[c].get('top', np.nan), summary[c].get('freq', np.nan)]
+          for c in sorted(categorical, key=lambda c: summary[c].get('unique') or 0)]),
+    ]
+    overview = f'{rows} rows, {len(summary)} columns ({len(numeric)} numeric, {len(categorical)} categorical).'
+    if sampling:
+        share = sampling['sample_rows'] / max(sampling['population_rows'], 1)
+        overview = (f"{sampling['population_rows']} rows, {len(summary)} columns ({len(numeric)} numeric, "
+                    f"{len(categorical)} categorical). Statistics are estimated from a uniform sample of "
+                    f"{sampling['sample_rows']} rows ({share:.1%}); counts refer to the sample and intervals "
+                    f"are {sampling['confidence']:.0%} confidence intervals.")
+    if outliers.get('multivariate'):
+        multivariate = outliers['multivariate']
+        if sampled and not sampling:
+            overview += f" Outliers are counted in a uniform sample of {outliers['rows_scored']} rows:"
+        overview += (f" {multivariate['outliers']} rows ({multivariate['outliers'] / outliers['rows_scored']:.1%}) "
+                     f"are multivariate outliers (Mahalanobis distance over {multivariate['distance_threshold']} "
+                     f"across {multivariate['columns']} numeric columns).")
+    return overview, sections
+
+def compile_facts(analysis, token_budget=PROMPT_TOKEN_BUDGET, titles=None, overview=True):
+    """Serialize the analysis as compact Markdown tables that fit within token_budget.
+
+    Rows are admitted round-robin across sections in priority order, so every section keeps its
+    most important facts and the prompt size stays roughly constant as the column count grows.
+    `titles` restricts the output to the prompt_sections() with those titles, and `overview=False`
+    drops the leading one-line overview.
+    """
+    summary_line, sections = prompt_sections(analysis)
+    if titles is not None:
+        sections = [section for section in sections if section[0] in titles]
+    kept = [[] for _ in sections]
+    open_sections = [bool(rows) for _, _, rows in sections]
+
+    def render():
+        parts = [summary_line] if overview else []
+        for (title, header, rows), chosen in zip(sections, kept):
+            if chosen:
+                omitted = len(rows) - len(chosen)
+                parts.append(f'### {title}' + (f' (top {len(chosen)} of {len(rows)})' if omitted else ''))
+                parts.append(_markdown_table(header, chosen))
+        return '\n\n'.join(parts)
+
+    depth = 0
+    while any(open_sections):
+        for i, (_, _, rows) in enumerate(sections):
+            if not open_sections[i]:
+                continue
+            kept[i].append(rows[depth])
+            if estimate_tokens(render()) > token_budget:
+                kept[i].pop()
+                open_sections[i] = False
+            elif depth + 1 >= len(rows):
+                open_sections[i] = False
+        depth += 1
+    return render()
+
+def build_prompt(analysis, token_budget=PROMPT_TOKEN_BUDGET):
+    """Build the narrative prompt around the budgeted analysis facts."""
+    return f"""
+You are a data analyst. Analyze the dataset dynamically based on the following analysis. Avoid assumptions.
+
+{compile_facts(analysis, token_budget)}
 
 1. Summarize the data structure, missing values, and key statistics.
 2. Explore relationships, trends, outliers, and patterns.
 3. Generate meaningful visualizations and actionable insights.
 4. Narrate findings clearly and concisely.
 """
+
+@traced('narrative')
+def generate_narrative(analysis, token_budget=PROMPT_TOKEN_BUDGET, cache_mode=None):
+    """Generate narrative using LLM."""
+    import httpx
+    prompt = build_prompt(analysis, token_budget)
+    print(f"Narrative prompt: ~{estimate_tokens(prompt)} tokens (facts budget {token_budget})")
     data = {
         "model": "gpt-4o-mini",
         "messages": [{"role": "user", "content": prompt}]
     }
+
+    async def request():
+        async with LLMClient() as client:
+            return await cached_completion(client, data, timeout=30.0, cache_mode=cache_mode)
+
     try:
-        response = httpx.post(API_URL, headers=headers, json=data, timeout=30.0)
-        response.raise_for_status()
-        return response.json()['choices'][0]['message']['content']
+        result = asyncio.run(request())
+        return result['choices'][0]['message']['content']
     except httpx.HTTPStatusError as e:
         print(f"HTTP error occurred: {e}")
     except httpx.RequestError as e:
@@ -110,27 +1646,258 @@ You are a data analyst. Analyze the dataset dynamically based on the following a
         print(f"An unexpected error occurred: {e}")
     return "Narrative generation failed due to an error."
 
+NARRATIVE_SECTIONS = [
+    NarrativeSection(
+        'Data overview', ('Numeric columns', 'Categorical columns (cardinality)'),
+        'Describe what the dataset contains: its size, what each row seems to represent, and the key '
+        'numeric and categorical columns with their typical values.',
+        '{overview}', None),
+    NarrativeSection(
+        'Missing values', ('Missing values',),
+        'Explain which columns have missing values and how many, plausible reasons, and how they '
+        'affect the analysis.',
+        'Missing values by column:', 'No column has missing values.'),
+    NarrativeSection(
+        'Correlations', ('Strongest correlations',),
+        'Interpret the strongest relationships. Separate trivial ones (e.g. counts that add up or IDs) '
+        'from insightful ones, and say what the insightful ones imply.',
+        'The strongest pairwise correlations:', 'There are too few numeric columns to correlate.'),
+    NarrativeSection(
+        'Outliers and distributions', ('Skew and outlier flags', 'Outlier counts', 'Anomalous rows'),
+        'Describe the skewed, multimodal and heavy-tailed columns, how many outliers each has, what the '
+        'most anomalous rows have in common or might indicate (data errors or genuine extremes), and how '
+        'to treat them.',
+        'Columns with skewed, multimodal or heavy-tailed distributions:',
+        'No numeric column is notably skewed or heavy-tailed.'),
+]
+SECTION_SYSTEM_PROMPT = (
+    'You are a data analyst writing one section of a README about a dataset. Use only the facts given '
+    'and avoid assumptions. Reply with Markdown for the section body only: no heading, at most {words} words.'
+)
+
+def chart_caption(spec):
+    if spec.kind == 'histogram':
+        return f'Distribution of {spec.columns[0]}'
+    if spec.kind == 'pairplot':
+        return f'Pairwise relationships between {", ".join(map(str, spec.columns))}'
+    if spec.kind == 'outliers':
+        return f'Outliers (red) in {spec.columns[0]} vs {spec.columns[1]}'
+    return f'Correlations between the {len(spec.columns)} most correlated numeric columns'
+
+def narrative_charts(rendered, distributions=None, limit=NARRATIVE_CHARTS):
+    """Pick the charts worth commenting on: heatmap, outliers and pairplot first, then the most skewed histograms."""
+    distributions = distributions or {}
+
+    def priority(spec):
+        skew = (distributions.get(spec.columns[0]) or {}).get('skew') if spec.kind == 'histogram' else None
+        return {'heatmap': 0, 'outliers': 1, 'pairplot': 2}.get(spec.kind, 3), -abs(skew or 0)
+
+    return sorted(rendered, key=priority)[:limit]
+
+def _chart_gallery(charts):
+    return '\n\n'.join(f'![{chart_caption(spec)}]({os.path.basename(spec.path)})' for spec in charts)
+
+async def _complete_text(client, messages, cache_mode, timeout):
+    data = {"model": "gpt-4o-mini", "messages": messages}
+    result = await asyncio.wait_for(cached_completion(client, data, timeout=timeout, cache_mode=cache_mode), timeout)
+    return result['choices'][0]['message']['content'].strip()
+
+async def _write_section(client, section, analysis, token_budget, cache_mode, timeout):
+    """Return (section body, whether it came from the LLM), falling back to the section's facts on failure."""
+    overview, tables = prompt_sections(analysis)
+    if not any(rows for title, _, rows in tables if title in section.facts) and section.empty:
+        return section.empty, False
+    facts = compile_facts(analysis, token_budget, section.facts)
+    prompt = f'Section: {section.title}\n\n{section.instructions}\n\nFacts:\n\n{facts}'
+    messages = [{"role": "system", "content": SECTION_SYSTEM_PROMPT.format(words=200)},
+                {"role": "user", "content": prompt}]
+    print(f"Section '{section.title}' prompt: ~{estimate_message_tokens(messages)} tokens "
+          f"(facts budget {token_budget})")
+    try:
+        return await _complete_text(client, messages, cache_mode, timeout), True
+    except Exception as e:
+        print(f"Section '{section.title}' uses its fallback: {e!r}")
+        tables = compile_facts(analysis, token_budget, section.facts, overview=False)
+        return f'{section.fallback.format(overview=overview)}\n\n{tables}', False
+
+def _chart_data_url(path, side=CHART_IMAGE_SIDE):
+    """PNG data URL of the chart downscaled to fit side x side, or the original if that is smaller."""
+    from PIL import Image  # A matplotlib dependency, so present whenever charts were rendered
+    with open(path, 'rb') as f:
+        data = f.read()
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail((side, side), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert('RGB').quantize(128).save(buffer, format='PNG', optimize=True)
+    if buffer.tell() < len(data):
+        data = buffer.getvalue()
+    return f"data:image/png;base64,{base64.b64encode(data).decode('ascii')}"
+
+async def _write_chart_commentary(client, charts, cache_mode, timeout):
+    """Comment on the charts with a vision request; the fallback is the captioned gallery alone."""
+    gallery = _chart_gallery(charts)
+    content = [{"type": "text", "text": (
+        'Comment on these charts from an automated analysis, in the order given. For each, write a short '
+        'paragraph that starts with its caption in bold and states what it shows and why it matters.\n\n'
+        + '\n'.join(f'{i + 1}. {chart_caption(spec)}' for i, spec in enumerate(charts)))}]
+    for spec in charts:
+        content.append({"type": "image_url", "image_url": {"url": _chart_data_url(spec.path), "detail": "low"}})
+    messages = [{"role": "system", "content": SECTION_SYSTEM_PROMPT.format(words=300)},
+                {"role": "user", "content": content}]
+    print(f"Section 'Charts' prompt: ~{estimate_message_tokens(messages)} tokens ({len(charts)} images)")
+    try:
+        return f'{gallery}\n\n{await _complete_text(client, messages, cache_mode, timeout)}', True
+    except Exception as e:
+        print(f"Section 'Charts' uses its fallback: {e!r}")
+        return gallery, False
+
+async def _timed_section(title, coroutine):
+    start = time.perf_counter()
+    with trace_span('section', title=title) as span:
+        body, from_llm = await coroutine
+        span.set(from_llm=from_llm)
+    print(f"Section '{title}' {'written' if from_llm else 'templated'} in {time.perf_counter() - start:.2f}s")
+    return body
+
+@traced('narrative')
+def generate_report(analysis, charts=(), title='Automated analysis', token_budget=PROMPT_TOKEN_BUDGET,
+                    cache_mode=None, timeout=NARRATIVE_SECTION_TIMEOUT):
+    """Write the README as independent sections requested concurrently, assembled in order.
+
+    Each section gets only its own facts; a section whose request fails or times out falls back to
+    a template built from the analysis, so the README is always complete and wall-clock time is the
+    slowest section rather than the sum.
+    """
+    sections = list(NARRATIVE_SECTIONS)
+
+    async def request():
+        async with LLMClient() as client:
+            tasks = [_timed_section(section.title, _write_section(client, section, analysis, token_budget,
+                                                                  cache_mode, timeout))
+                     for section in sections]
+            if charts:
+                tasks.append(_timed_section('Charts', _write_chart_commentary(client, charts, cache_mode, timeout)))
+            return await asyncio.gather(*tasks)
+
+    bodies = asyncio.run(request())
+    titles = [section.title for section in sections] + (['Charts'] if charts else [])
+    return '\n\n'.join([f'# {title}'] + [f'## {heading}\n\n{body}' for heading, body in zip(titles, bodies)]) + '\n'
+
+@traced('autolysis')
 def main():
     import argparse
 
     parser = argparse.ArgumentParser(description="Analyze datasets and generate insights.")
-    parser.add_argument("file_path", help="Path to the dataset CSV file.")
+    parser.add_argument("file_path", nargs="?", help="Path to the dataset CSV file.")
     parser.add_argument("-o", "--output_dir", default="output", help="Directory to save outputs.")
+    parser.add_argument("--columns", type=lambda value: value.split(","),
+                        help="Comma-separated columns to load and analyze (default: all).")
+    parser.add_argument("--frame-cache", choices=["on", "off", "refresh"], default=FRAME_CACHE_MODE,
+                        help="Use, bypass, or refresh the on-disk columnar cache of parsed CSVs.")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Print per-column memory before and after dtype optimization "
+                             "(use --frame-cache refresh to see the savings for an already cached file).")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--stream", action="store_true",
+                      help="Analyze in chunks with bounded memory; plots use a uniform row sample.")
+    mode.add_argument("--sample", type=int, metavar="N",
+                      help="Analyze a uniform sample of N rows drawn in one pass, with confidence intervals.")
+    mode.add_argument("--sample-fraction", type=float, metavar="F",
+                      help="Like --sample, keeping each row with probability F.")
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNKSIZE,
+                        help="Rows per chunk in --stream and --sample modes.")
+    parser.add_argument("--pairplot-columns", type=int, default=PAIRPLOT_MAX_COLUMNS,
+                        help="Maximum numeric columns in the pairplot (0 to skip it).")
+    parser.add_argument("--plot-rows", type=int, default=PLOT_ROW_BUDGET,
+                        help="Maximum rows drawn in scatter panels; larger data is sampled.")
+    parser.add_argument("--correlation", choices=["pearson", "spearman"], default="pearson",
+                        help="Correlation coefficient for the analysis (--stream always uses Pearson). With "
+                             "missing values, Spearman ranks each column once, approximating per-pair ranks.")
+    parser.add_argument("--heatmap-columns", type=int, default=CORRELATION_MATRIX_COLUMNS,
+                        help="Maximum columns in the correlation heatmap (0 to skip it).")
+    parser.add_argument("--outlier-rows", type=int, default=OUTLIER_ROW_BUDGET,
+                        help="Maximum rows used to fit the robust outlier model; every row is still scored.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Render charts in this many processes.")
+    parser.add_argument("--prompt-tokens", type=int, default=PROMPT_TOKEN_BUDGET,
+                        help="Approximate token budget for the analysis facts sent to the LLM.")
+    parser.add_argument("--llm-cache", choices=["on", "off", "refresh"], default=LLM_CACHE_MODE,
+                        help="Use, bypass, or refresh the on-disk LLM response cache.")
+    parser.add_argument("--narrative", choices=["sections", "single"], default="sections",
+                        help="Write the README as concurrent per-section requests with templated fallbacks, "
+                             "or as one request.")
+    parser.add_argument("--no-plots", action="store_true", help="Skip the charts; matplotlib is never imported.")
+    parser.add_argument("--analysis-only", action="store_true",
+                        help="Skip the charts and the LLM; README.md gets the analysis facts instead.")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Build matplotlib's font cache (then exit if no file is given).")
     args = parser.parse_args()
 
+    if args.prewarm:
+        prewarm_fonts()
+        if not args.file_path:
+            return
+    if not args.file_path:
+        parser.error("the following arguments are required: file_path")
+    current_span().set(file=os.path.basename(args.file_path), jobs=args.jobs,
+                       mode='stream' if args.stream else 'sample' if args.sample or args.sample_fraction else 'full')
+
+    # Load environment variables
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not args.analysis_only and not os.getenv("AIPROXY_TOKEN"):
+        raise ValueError("API token not set. Please set AIPROXY_TOKEN in the environment.")
+
     os.makedirs(args.output_dir, exist_ok=True)
 
-    # Load data
-    df = load_data(args.file_path)
+    if args.stream:
+        # Load and analyze data in one pass, keeping only a row sample for the plots
+        analysis, df = analyze_stream(args.file_path, chunksize=args.chunksize, columns=args.columns)
+        df, memory_report = optimize_dtypes(df)
+        if args.memory_report:
+            print_memory_report(memory_report)
+    elif args.sample or args.sample_fraction:
+        # Analyze and plot a one-pass uniform sample, recording how precise its estimates are
+        df, rows = sample_csv(args.file_path, sample_rows=args.sample, fraction=args.sample_fraction,
+                              chunksize=args.chunksize, columns=args.columns)
+        df, memory_report = optimize_dtypes(df)
+        if args.memory_report:
+            print_memory_report(memory_report)
+        analysis = analyze_data(df, correlation_method=args.correlation)
+        analysis['sampling'] = sample_confidence(df, rows, method=args.correlation)
+        print(f"Sampled {len(df)} of {rows} rows")
+    else:
+        # Load data
+        df = load_data(args.file_path, columns=args.columns, cache_mode=args.frame_cache,
+                       memory_report=args.memory_report)
+
+        # Analyze data
+        analysis = analyze_data(df, correlation_method=args.correlation)
+
+    # Precompute histograms and KDE curves once, for both the plots and the narrative
+    distributions = compute_distributions(df)
+    analysis['distributions'] = describe_distributions(distributions)
 
-    # Analyze data
-    analysis = analyze_data(df)
+    # Score every loaded row (only the row sample with --stream or --sample) for univariate and multivariate
+    # outliers against a robust model fit on a sample
+    analysis['outliers'] = detect_outliers(df, row_budget=args.outlier_rows)
 
     # Visualize data
-    visualize_data(df, args.output_dir)
+    rendered = []
+    if not (args.no_plots or args.analysis_only):
+        rendered = visualize_data(df, args.output_dir, pairplot_columns=args.pairplot_columns,
+                                  row_budget=args.plot_rows, jobs=args.jobs, distributions=distributions,
+                                  heatmap_columns=args.heatmap_columns, outlier_rows=args.outlier_rows)
 
     # Generate narrative
-    narrative = generate_narrative(analysis)
+    if args.analysis_only:
+        facts = compile_facts(analysis, args.prompt_tokens)
+        narrative = f"# Analysis of {os.path.basename(args.file_path)}\n\n{facts}\n"
+    elif args.narrative == 'single':
+        narrative = generate_narrative(analysis, token_budget=args.prompt_tokens, cache_mode=args.llm_cache)
+    else:
+        narrative = generate_report(analysis, narrative_charts(rendered, analysis['distributions']),
+                                    title=f"Automated analysis of {os.path.basename(args.file_path)}",
+                                    token_budget=args.prompt_tokens, cache_mode=args.llm_cache)
 
     # Save narrative
     readme_path = os.path.join(args.output_dir, 'README.md')
@@ -0,0 +1,299 @@
+# /// script
+# requires-python = ">=3.11"
+# dependencies = [
+#   "pandas",
+#   "seaborn",
+#   "matplotlib",
+#   "httpx",
+#   "chardet",
+#   "pyarrow",
+#   "python-dotenv",
+# ]
+# ///
+
+"""Benchmark the autolysis pipeline stage by stage on synthetic datasets.
+
+Synthetic CSVs are bootstrapped from a bundled dataset (goodreads, happiness or media), so columns
+keep realistic distributions while rows, column counts, missing rates and encodings are controlled.
+The LLM call is served by a local stub. Results are written as JSON for comparison across commits:
+
+    uv run benchmark.py -o before.json
+    git checkout my-branch
+    uv run benchmark.py -o after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES = ('goodreads', 'happiness', 'media')
+STAGES = ('load', 'analyze', 'distributions', 'outliers', 'visualize', 'narrative')
+DEFAULT_ROWS = '1000,10000,100000'
+DEFAULT_COLUMNS = '4,8,16,32'
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'scipy', 'httpx', 'chardet', 'dotenv', 'pyarrow')
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible chat completion endpoint that answers instantly (or after `latency` seconds)."""
+
+    latency = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        prompt = json.dumps(body['messages'])
+        content = f"# Benchmark narrative\n\nPrompt of {len(prompt)} characters."
+        reply = json.dumps({
+            'choices': [{'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': 10,
+                      'total_tokens': len(prompt) // 4 + 10},
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+def start_stub(latency):
+    """Serve the stub LLM on a free local port in a daemon thread, returning its base URL."""
+    StubLLMHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+def load_autolysis(api_base, cache_dir):
+    """Import autolysis pointed at the stub LLM and a scratch cache directory."""
+    os.environ['AUTOLYSIS_API_BASE'] = api_base
+    os.environ['AUTOLYSIS_CACHE_DIR'] = cache_dir
+    os.environ.setdefault('AIPROXY_TOKEN', 'benchmark')
+    sys.path.insert(0, HERE)
+    import autolysis
+    return autolysis
+
+def load_template(autolysis, name):
+    """Split a bundled dataset into numeric and categorical value pools to bootstrap from."""
+    df = autolysis.load_data(os.path.join(HERE, f'{name}.csv'), cache_mode='off')
+    numeric = {c: df[c].dropna().to_numpy() for c in df.select_dtypes(include=['number']).columns}
+    categorical = {c: df[c].dropna().astype(str).to_numpy() for c in df.columns if c not in numeric}
+    return {k: v for k, v in numeric.items() if len(v)}, {k: v for k, v in categorical.items() if len(v)}
+
+def synthesize(template, rows, numeric, categorical, missing, seed=0):
+    """Bootstrap a frame of `rows` rows from the template, reusing its columns cyclically as needed."""
+    rng = np.random.default_rng(seed)
+    numeric_pool, categorical_pool = template
+    columns = {}
+    for pool, count in ((numeric_pool, numeric), (categorical_pool, categorical)):
+        names = list(pool)
+        for i in range(count if names else 0):
+            source = names[i % len(names)]
+            name = source if i < len(names) else f'{source}_{i // len(names) + 1}'
+            values = rng.choice(pool[source], size=rows)
+            if missing:
+                values = pd.Series(values).mask(rng.random(rows) < missing)
+            columns[name] = values
+    return pd.DataFrame(columns)
+
+def write_csv(df, path, encoding):
+    # Characters the target encoding cannot represent are replaced, as a legacy export would
+    df.to_csv(path, index=False, encoding=encoding, errors='replace')
+
+def timed(function, *args, **kwargs):
+    """Call function with stdout silenced, returning (result, elapsed seconds)."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def run_pipeline(autolysis, csv_path, output_dir, jobs, stages):
+    """Run the pipeline stages in main()'s order, returning {stage: seconds} for the selected stages."""
+    elapsed = {}
+    df, elapsed['load'] = timed(autolysis.load_data, csv_path, cache_mode='off')
+    analysis, elapsed['analyze'] = timed(autolysis.analyze_data, df)
+    distributions, elapsed['distributions'] = timed(autolysis.compute_distributions, df)
+    analysis['distributions'] = autolysis.describe_distributions(distributions)
+    analysis['outliers'], elapsed['outliers'] = timed(autolysis.detect_outliers, df)
+    rendered = []
+    if 'visualize' in stages:
+        rendered, elapsed['visualize'] = timed(autolysis.visualize_data, df, output_dir, jobs=jobs,
+                                               distributions=distributions)
+    if 'narrative' in stages:
+        charts = autolysis.narrative_charts(rendered, analysis['distributions'])
+        _, elapsed['narrative'] = timed(autolysis.generate_report, analysis, charts, cache_mode='off')
+    return {stage: seconds for stage, seconds in elapsed.items() if stage in stages}
+
+def benchmark_case(autolysis, template, case, work_dir, repeat, jobs, stages):
+    """Generate one synthetic CSV and time the pipeline on it `repeat` times."""
+    df = synthesize(template, case['rows'], case['numeric'], case['categorical'], case['missing'])
+    csv_path = os.path.join(work_dir, 'data.csv')
+    write_csv(df, csv_path, case['encoding'])
+    runs = [run_pipeline(autolysis, csv_path, os.path.join(work_dir, f'output-{i}'), jobs, stages)
+            for i in range(repeat)]
+    return {
+        **case,
+        'bytes': os.path.getsize(csv_path),
+        'stages': {stage: float(np.median([run[stage] for run in runs])) for stage in runs[0]},
+        'runs': runs,
+    }
+
+def scaling_exponents(results, sweep, key):
+    """Log-log slope of each stage's time against `key` across a sweep (1.0 means linear)."""
+    cases = [r for r in results if r['sweep'] == sweep]
+    if len(cases) < 2:
+        return {}
+    x = np.log([case[key] for case in cases])
+    exponents = {}
+    for stage in cases[0]['stages']:
+        y = np.log([max(case['stages'][stage], 1e-6) for case in cases])
+        exponents[stage] = round(float(np.polyfit(x, y, 1)[0]), 2)
+    return exponents
+
+def _wall_time(command):
+    start = time.perf_counter()
+    subprocess.run(command, cwd=HERE, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+def startup_benchmark(repeat):
+    """Time autolysis startup in fresh interpreters and list the slowest imports from -X importtime."""
+    import_command = [sys.executable, '-c', 'import autolysis']
+    probe = f'import autolysis, sys; print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    loaded = subprocess.run([sys.executable, '-c', probe], cwd=HERE, capture_output=True, text=True, check=True)
+    profile = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import autolysis'], cwd=HERE,
+                             capture_output=True, text=True, check=True)
+    # Lines look like "import time: self [us] | cumulative | package", children indented (and listed) before
+    # their parent. Keep the modules autolysis itself imports, i.e. the depth-1 lines just before it.
+    imports, children = [], []
+    for line in profile.stderr.splitlines()[1:]:
+        _, cumulative, package = line.split('|')
+        depth = (len(package) - len(package.lstrip())) // 2
+        if depth == 1:
+            children.append((package.strip(), int(cumulative) / 1e6))
+        elif depth == 0:
+            if package.strip() == 'autolysis':
+                imports = children
+            children = []
+    imports.sort(key=lambda item: -item[1])
+    return {
+        'import_seconds': float(np.median([_wall_time(import_command) for _ in range(repeat)])),
+        'help_seconds': float(np.median([_wall_time([sys.executable, 'autolysis.py', '--help'])
+                                         for _ in range(repeat)])),
+        'heavy_modules_on_import': [m for m in loaded.stdout.strip().split(',') if m],
+        'slowest_imports': [{'module': module, 'seconds': round(seconds, 4)} for module, seconds in imports[:10]],
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def case_key(result):
+    return tuple(result[k] for k in ('sweep', 'template', 'encoding', 'rows', 'numeric', 'categorical', 'missing'))
+
+def print_results(results, baseline=None):
+    """Print one line per case with the median seconds of each stage and, optionally, the ratio to a baseline."""
+    previous = {case_key(result): result for result in (baseline or {}).get('results', [])}
+    for result in results:
+        label = (f"{result['sweep']:>7} rows={result['rows']:<8} num={result['numeric']:<3} "
+                 f"cat={result['categorical']:<3}")
+        old = previous.get(case_key(result))
+        cells = []
+        for stage, seconds in result['stages'].items():
+            cell = f'{stage} {seconds:.3f}s'
+            if old and old['stages'].get(stage):
+                cell += f" ({seconds / old['stages'][stage]:.2f}x)"
+            cells.append(cell)
+        print(f'{label} {"  ".join(cells)}')
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark autolysis stages on synthetic datasets.")
+    parser.add_argument("--template", choices=TEMPLATES, default="goodreads", help="Bundled dataset to mimic.")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="Comma-separated row counts for the row sweep.")
+    parser.add_argument("--columns", default=DEFAULT_COLUMNS,
+                        help="Comma-separated numeric column counts for the column sweep.")
+    parser.add_argument("--base-rows", type=int, default=10_000, help="Rows used in the column sweep.")
+    parser.add_argument("--numeric", type=int, default=8, help="Numeric columns used in the row sweep.")
+    parser.add_argument("--categorical", type=int, default=4, help="Categorical columns in every case.")
+    parser.add_argument("--missing", type=float, default=0.05, help="Share of cells blanked out at random.")
+    parser.add_argument("--encoding", default="utf-8", help="Encoding of the generated CSVs, e.g. latin-1.")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to time.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is reported.")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="Processes for chart rendering.")
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Seconds the stub LLM waits before replying.")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="Earlier JSON results to print speed ratios against.")
+    parser.add_argument("--startup-only", action="store_true", help="Only benchmark import and startup time.")
+    args = parser.parse_args()
+
+    print("Benchmarking startup", file=sys.stderr)
+    startup = startup_benchmark(max(args.repeat, 5))
+    stages = [] if args.startup_only else args.stages.split(',')
+    rows = '' if args.startup_only else args.rows
+    columns = '' if args.startup_only else args.columns
+    with tempfile.TemporaryDirectory() as work_dir:
+        autolysis = load_autolysis(start_stub(args.llm_latency), os.path.join(work_dir, 'cache'))
+        template = load_template(autolysis, args.template)
+        common = {'categorical': args.categorical, 'missing': args.missing, 'encoding': args.encoding,
+                  'template': args.template}
+        cases = ([{'sweep': 'rows', 'rows': int(rows), 'numeric': args.numeric, **common}
+                  for rows in rows.split(',') if rows]
+                 + [{'sweep': 'columns', 'rows': args.base_rows, 'numeric': int(numeric), **common}
+                    for numeric in columns.split(',') if numeric])
+        results = []
+        for case in cases:
+            print(f"Benchmarking {case['sweep']} sweep: {case['rows']} rows, {case['numeric']} numeric columns",
+                  file=sys.stderr)
+            results.append(benchmark_case(autolysis, template, case, work_dir, args.repeat, args.jobs, stages))
+
+    report = {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'settings': vars(args),
+        'startup': startup,
+        'results': results,
+        'scaling': {
+            'rows': scaling_exponents(results, 'rows', 'rows'),
+            'columns': scaling_exponents(results, 'columns', 'numeric'),
+        },
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    old_startup = (baseline or {}).get('startup', {}).get('import_seconds')
+    print(f"Startup: import {startup['import_seconds']:.3f}s"
+          + (f" ({startup['import_seconds'] / old_startup:.2f}x)" if old_startup else "")
+          + f", --help {startup['help_seconds']:.3f}s, heavy modules on import: "
+          + (", ".join(startup['heavy_modules_on_import']) or "none"))
+    print_results(results, baseline)
+    for sweep, exponents in report['scaling'].items():
+        if exponents:
+            print(f"Scaling exponent vs {sweep}: " + ", ".join(f"{k} {v}" for k, v in exponents.items()))
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
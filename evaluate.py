@@ -3,6 +3,7 @@
 # dependencies = [
 #     "httpx",
 #     "pandas",
+#     "pillow",
 #     "platformdirs",
 #     "python-dotenv",
 #     "rich",
@@ -11,21 +12,36 @@
 
 import argparse
 import base64
+import contextvars
 import dotenv
+import email.utils
+import functools
 import glob
+import hashlib
 import httpx
+import importlib.util
+import io
 import json
 import os
 import pandas as pd
 import random
+import re
+import resource
 import shutil
+import signal
+import sqlite3
 import sys
+import tempfile
+import threading
 import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
-from collections import namedtuple, Counter
+from collections import namedtuple, Counter, OrderedDict
+from PIL import Image
 from platformdirs import user_data_dir
 from rich.console import Console
-from subprocess import run, PIPE
+from subprocess import Popen, TimeoutExpired, run
 
 # Deadline for repo is 15 Dec 2024 EOD AOE. If you're hacking dates, remember:
 # 1. Change your commit time to before the deadline
@@ -49,6 +65,8 @@ elif "AIPROXY_TOKEN" in os.environ:
     openai_api_base = "https://aiproxy.sanand.workers.dev/openai/v1"
 else:
     raise ValueError("Missing AIPROXY_TOKEN")
+# Point at another OpenAI-compatible endpoint, e.g. a local mock server for testing
+openai_api_base = os.getenv("OPENAI_API_BASE", openai_api_base)
 
 
 # Sample datasets from https://drive.google.com/drive/folders/1KNGfcgA1l2uTnqaldaX6LFr9G1RJQNK3
@@ -60,6 +78,33 @@ sample_datasets = {
 # Test datasets from a secret environment variable
 test_datasets = json.loads(os.getenv("DATASETS", "{}"))
 
+# LLM responses are cached on disk. SKIP_LLM_CACHE=Y bypasses it, REFRESH_LLM_CACHE=Y re-fetches and overwrites.
+llm_cache_path = os.path.join(root, "llm-cache.sqlite")
+llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 86400
+llm_cache_max_bytes = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+llm_cache_stats = Counter()
+
+# LLM requests share one pooled client, are rate limited to LLM_RPM requests and LLM_TPM tokens per
+# minute (0 = unlimited), and retry 429/5xx/network errors up to LLM_MAX_RETRIES times with backoff.
+llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", "5"))
+llm_client = httpx.Client(
+    http2=importlib.util.find_spec("h2") is not None,
+    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=60),
+)
+
+# Concurrency limits per stage when evaluating several submissions at once (see --workers)
+stage_slots = {stage: threading.BoundedSemaphore(1) for stage in ("clone", "run", "llm")}
+dataset_lock = threading.RLock()
+
+# TRACE_FILE=path appends one JSON line per timed span (clone, run, LLM request, ...) to path, with
+# OpenTelemetry field names: trace_id, span_id, parent_id, start, duration, attributes and error.
+# Each line is one O_APPEND write, so threads and processes can share the file. Unset, spans are a
+# shared no-op. Runs get TRACEPARENT and AUTOLYSIS_TRACE, so an instrumented autolysis.py (which writes
+# the same records) joins the trace. `--trace-summary path` reports p50/p95 per stage.
+trace_path = os.path.abspath(os.environ["TRACE_FILE"]) if os.getenv("TRACE_FILE") else None
+trace_current = contextvars.ContextVar("trace_current", default=None)
+trace_fd = None
+
 
 def log(msg: str, last=False):
     """Log a message to the console."""
@@ -78,19 +123,390 @@ def open_encoded(path: str):
     raise ValueError(f"{path}: Unknown encoding")
 
 
+class NoSpan:
+    """Falsy no-op returned by trace_span() when tracing is off."""
+
+    def __bool__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+no_span = NoSpan()
+
+
+class Span:
+    """A timed operation, written to trace_path when it ends."""
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = os.urandom(8).hex()
+        self.attributes = attributes
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent value that makes this span the parent of spans in a child process."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start, self.clock = time.time(), time.perf_counter()
+        self.token = trace_current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        duration = time.perf_counter() - self.clock
+        trace_current.reset(self.token)
+        record = {
+            "name": self.name,
+            "service": "evaluate",
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "duration": round(duration, 6),
+            "pid": os.getpid(),
+            "attributes": self.attributes,
+        }
+        if exc_type:
+            record["error"] = repr(exc)
+        write_span(record)
+        return False
+
+
+def write_span(record: dict):
+    global trace_fd
+    try:
+        if trace_fd is None:
+            trace_fd = os.open(trace_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(trace_fd, (json.dumps(record, default=str) + "\n").encode())
+    except OSError as e:
+        log(f"[red]TRACE[/red] {e}", last=True)
+
+
+def trace_span(name: str, **attributes) -> Span | NoSpan:
+    """Context manager timing `name` under the current span, or no_span when tracing is off."""
+    if not trace_path:
+        return no_span
+    return Span(name, trace_current.get(), attributes)
+
+
+def current_span() -> Span | NoSpan:
+    """The innermost open span on this thread, or no_span, for attaching attributes."""
+    return trace_current.get() or no_span
+
+
+def traced(name: str):
+    """Decorator that wraps a function in a span, or leaves it untouched when tracing is off."""
+
+    def decorate(function):
+        if not trace_path:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with trace_span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def trace_summary(path: str) -> pd.DataFrame:
+    """Duration percentiles per stage (service and span name) across every run in a JSONL trace."""
+    spans = pd.read_json(path, lines=True)
+    spans["failed"] = spans["error"].notna() if "error" in spans else False
+    summary = spans.groupby(["service", "name"]).agg(
+        count=("duration", "size"),
+        p50=("duration", "median"),
+        p95=("duration", lambda duration: duration.quantile(0.95)),
+        max=("duration", "max"),
+        total=("duration", "sum"),
+        errors=("failed", "sum"),
+    )
+    return summary.sort_values("total", ascending=False)
+
+
+def llm_cache_key(payload: dict) -> str:
+    """Content address of a chat completion request: model, messages, response_format, temperature."""
+    keyed = {key: payload.get(key) for key in ("model", "messages", "response_format", "temperature")}
+    return hashlib.sha256(json.dumps(keyed, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def llm_cache_db() -> sqlite3.Connection:
+    """Open the LLM response cache, creating it if required."""
+    os.makedirs(root, exist_ok=True)
+    db = sqlite3.connect(llm_cache_path, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS responses "
+        "(key TEXT PRIMARY KEY, response TEXT, size INTEGER, created REAL, accessed REAL)"
+    )
+    return db
+
+
+def llm_cache_evict(db: sqlite3.Connection):
+    """Drop expired responses, then least recently used ones until the cache fits its size limit."""
+    db.execute("DELETE FROM responses WHERE created < ?", (time.time() - llm_cache_ttl,))
+    db.execute(
+        """DELETE FROM responses WHERE key IN (
+            SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY accessed DESC) AS used FROM responses)
+            WHERE used > ?)""",
+        (llm_cache_max_bytes,),
+    )
+
+
+class TokenBucket:
+    """Thread-safe token bucket holding up to one minute of capacity, refilled continuously."""
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.per_minute, self.tokens + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        """Block until `amount` (capped at the bucket size) is available, then take it."""
+        if self.per_minute <= 0:
+            return
+        amount = min(amount, self.per_minute)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) * 60 / self.per_minute
+            time.sleep(wait)
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) tokens once the real usage is known."""
+        if self.per_minute > 0:
+            with self.lock:
+                self.tokens -= amount
+
+
+request_bucket = TokenBucket(float(os.getenv("LLM_RPM", "0")))
+token_bucket = TokenBucket(float(os.getenv("LLM_TPM", "0")))
+
+
+def estimate_request_tokens(payload: dict) -> int:
+    """Roughly estimate prompt tokens: ~4 characters per token, 85 per low-detail image."""
+    tokens = 0
+    for message in payload.get("messages", []):
+        parts = message["content"] if isinstance(message["content"], list) else [message["content"]]
+        for part in parts:
+            is_image = isinstance(part, dict) and part.get("type") == "image_url"
+            tokens += 85 if is_image else len(json.dumps(part)) // 4
+    return tokens
+
+
+def retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    """Jittered exponential backoff, never shorter than the server's Retry-After."""
+    delay = min(60.0, 2.0**attempt) * random.uniform(0.5, 1.0)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, float(retry_after))
+        except ValueError:
+            when = email.utils.parsedate_to_datetime(retry_after)
+            delay = max(delay, (when - datetime.now(timezone.utc)).total_seconds())
+    return delay
+
+
+def llm_post(payload: dict, timeout: float) -> httpx.Response:
+    """POST a chat completion through the pooled, rate limited client with retries."""
+    estimate = estimate_request_tokens(payload)
+    for attempt in range(llm_max_retries + 1):
+        request_bucket.acquire()
+        token_bucket.acquire(estimate)
+        response = None
+        try:
+            with trace_span("llm_request", model=payload.get("model"), attempt=attempt) as span:
+                response = llm_client.post(
+                    f"{openai_api_base}/chat/completions", headers=headers, json=payload, timeout=timeout
+                )
+                if span:
+                    usage = response.json().get("usage", {}) if response.status_code == 200 else {}
+                    span.set(
+                        status=response.status_code,
+                        request_bytes=len(response.request.content),
+                        response_bytes=len(response.content),
+                        prompt_tokens=usage.get("prompt_tokens"),
+                        completion_tokens=usage.get("completion_tokens"),
+                    )
+            if response.status_code != 429 and response.status_code < 500:
+                usage = response.json().get("usage", {}) if response.status_code == 200 else {}
+                token_bucket.adjust(usage.get("total_tokens", estimate) - estimate)
+                return response
+        except httpx.TransportError:
+            if attempt == llm_max_retries:
+                raise
+        if attempt == llm_max_retries:
+            return response
+        delay = retry_delay(attempt, response)
+        status = response.status_code if response is not None else "network error"
+        log(f"[yellow]LLM RETRY[/yellow] {status}, attempt {attempt + 1} in {delay:.1f}s")
+        time.sleep(delay)
+
+
+@traced("llm")
+def chat_completion(payload: dict, timeout: float) -> dict:
+    """POST a chat completion, serving repeated requests from the on-disk cache."""
+    use_cache = os.getenv("SKIP_LLM_CACHE") != "Y"
+    key = llm_cache_key(payload)
+    if use_cache and os.getenv("REFRESH_LLM_CACHE") != "Y":
+        with llm_cache_db() as db:
+            row = db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, time.time() - llm_cache_ttl),
+            ).fetchone()
+            if row:
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+                llm_cache_stats["hit"] += 1
+                current_span().set(cache="hit")
+                return json.loads(row[0])
+    llm_cache_stats["miss"] += 1
+    current_span().set(cache="miss" if use_cache else "off")
+    with stage_slots["llm"]:
+        response = llm_post(payload, timeout)
+    result = response.json()
+    # Only cache successful completions so that errors are retried on the next run
+    if use_cache and response.status_code == 200 and result.get("choices"):
+        text, now = json.dumps(result), time.time()
+        with llm_cache_db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, text, len(text), now, now),
+            )
+            llm_cache_evict(db)
+    return result
+
+
+datasets_dir = os.path.join(root, "datasets")
+dataset_manifest_path = os.path.join(datasets_dir, "manifest.json")
+dataset_manifest = {}  # {name: {"sha256", "size", "mtime_ns"}}, guarded by dataset_lock
+dataset_errors = {}  # {name: reason} for failed downloads, guarded by dataset_lock
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def manifest_entry(path: str, sha256: str) -> dict:
+    stat = os.stat(path)
+    return {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def fetch_dataset(name: str, id: str) -> dict:
+    """Stream a dataset from Google Drive to disk, returning its manifest entry."""
+    url = f"https://drive.usercontent.google.com/download?id={id}"
+    target = os.path.join(datasets_dir, name)
+    log(f"[yellow]DOWNLOAD[/yellow] {name}...")
+    digest = hashlib.sha256()
+    with httpx.stream("GET", url, timeout=30) as response:
+        response.raise_for_status()
+        with open(f"{target}.part", "wb") as f:
+            for chunk in response.iter_bytes():
+                digest.update(chunk)
+                f.write(chunk)
+    os.chmod(f"{target}.part", 0o444)
+    os.replace(f"{target}.part", target)
+    return manifest_entry(target, digest.hexdigest())
+
+
+def dataset_intact(name: str) -> bool:
+    """Check a stored dataset against the manifest: a stat lookup, hashing only if the stat changed."""
+    entry, target = dataset_manifest.get(name), os.path.join(datasets_dir, name)
+    if not entry or not os.path.exists(target):
+        return False
+    stat = os.stat(target)
+    if (stat.st_size, stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+        return True
+    if stat.st_size == entry["size"] and file_sha256(target) == entry["sha256"]:
+        dataset_manifest[name] = manifest_entry(target, entry["sha256"])
+        return True
+    return False
+
+
+@traced("datasets")
 def download_datasets():
-    """Download the datasets from Google Drive."""
-    datasets_dir = os.path.join(root, "datasets")
+    """Download missing or damaged datasets from Google Drive concurrently, recording their SHA-256."""
     os.makedirs(datasets_dir, exist_ok=True)
-    for name, id in (*sample_datasets.items(), *test_datasets.items()):
-        target = os.path.join(datasets_dir, name)
-        if not os.path.exists(target) or os.path.getsize(target) == 0:
-            url = f"https://drive.usercontent.google.com/download?id={id}"
-            log(f"[yellow]DOWNLOAD[/yellow] {name}...")
-            result = httpx.get(url, timeout=30)
-            result.raise_for_status()
-            with open(target, "wb") as f:
-                f.write(result.content)
+    with dataset_lock:
+        if not dataset_manifest and os.path.exists(dataset_manifest_path):
+            with open(dataset_manifest_path) as f:
+                dataset_manifest.update(json.load(f))
+        missing = {}
+        for name, id in (*sample_datasets.items(), *test_datasets.items()):
+            target = os.path.join(datasets_dir, name)
+            if dataset_intact(name):
+                continue
+            # Adopt files downloaded before the manifest existed
+            if name not in dataset_manifest and os.path.exists(target) and os.path.getsize(target) > 0:
+                os.chmod(target, 0o444)
+                dataset_manifest[name] = manifest_entry(target, file_sha256(target))
+                continue
+            missing[name] = id
+        with ThreadPoolExecutor(max_workers=max(1, len(missing))) as pool:
+            futures = {pool.submit(fetch_dataset, name, id): name for name, id in missing.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    dataset_manifest[name] = future.result()
+                    dataset_errors.pop(name, None)
+                except Exception as e:
+                    # Runs on this dataset fail; everything else is still evaluated
+                    dataset_errors[name] = f"dataset {name} unavailable: {e}"
+                    log(f"[red]DOWNLOAD FAILED[/red] {name}: {e}", last=True)
+        with open(dataset_manifest_path, "w") as f:
+            json.dump(dataset_manifest, f, indent=2)
+
+
+def submission_dataset(id: str, name: str) -> str:
+    """Give a submission its own read-only hardlink (or copy) of a verified dataset."""
+    source = os.path.join(datasets_dir, name)
+    target = os.path.join(root, id, "eval", ".datasets", name)
+    with dataset_lock:
+        if name not in dataset_errors and not dataset_intact(name):
+            download_datasets()
+        if name in dataset_errors:
+            raise ValueError(dataset_errors[name])
+        entry = dataset_manifest[name]
+    if os.path.exists(target):
+        stat = os.stat(target)
+        if (stat.st_size, stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+            return target
+        os.remove(target)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+        os.chmod(target, 0o444)
+    return target
 
 
 def parse_github_url(raw_url: str) -> HEAD:
@@ -104,39 +520,94 @@ def parse_github_url(raw_url: str) -> HEAD:
         return HEAD(parts[3], parts[4], parts[5])
 
 
+# Clones come from GIT_BASE_URL (e.g. file:///path/to/repos for testing). Each repo is fetched into a
+# partial (blob:none) bare mirror. CLONE_SHALLOW_DAYS limits fetched history to that many days before the deadline.
+git_base_url = os.getenv("GIT_BASE_URL", "https://github.com")
+mirrors_dir = os.path.join(root, ".mirrors")
+mirror_locks = {}
+
+
+def git(*args: str, **kwargs) -> str:
+    """Run a git command without prompting, returning stdout."""
+    env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+    return run(["git", *args], check=True, capture_output=True, text=True, env=env, **kwargs).stdout.strip()
+
+
+@traced("fetch")
+def update_mirror(mirror: str, head: HEAD, deadline: datetime):
+    """Create or fetch the branch into the cached bare mirror."""
+    repo_url = f"{git_base_url}/{head.owner}/{head.repo}.git"
+    fetch = ["--filter=blob:none"]
+    if os.getenv("CLONE_SHALLOW_DAYS"):
+        since = deadline - timedelta(days=float(os.getenv("CLONE_SHALLOW_DAYS")))
+        fetch.append(f"--shallow-since={since.isoformat()}")
+    with stage_slots["clone"]:
+        if not os.path.exists(mirror):
+            git("clone", "-q", "--bare", "--single-branch", "-b", head.branch, *fetch, repo_url, mirror)
+        else:
+            git("-C", mirror, "remote", "set-url", "origin", repo_url)
+            refspec = f"+refs/heads/{head.branch}:refs/heads/{head.branch}"
+            git("-C", mirror, "fetch", "-q", "--prune", *fetch, "origin", refspec)
+
+
+def resolve_deadline_commit(mirror: str, branch: str, deadline: datetime) -> str:
+    """Latest commit on the branch before the deadline, reused while the branch tip is unchanged."""
+    tip = git("-C", mirror, "rev-parse", f"refs/heads/{branch}")
+    cache_path = os.path.join(mirror, "deadline-commits.json")
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path) as f:
+            cache = json.load(f)
+    key = f"{branch} {deadline.isoformat()}"
+    if cache.get(key, {}).get("tip") == tip:
+        return cache[key]["commit"]
+    log_args = ["-C", mirror, "log", "-q", f"refs/heads/{branch}", "--before", deadline.isoformat()]
+    commit = git(*log_args, "--format=%H", "-n", "1", "--")
+    if not commit and os.path.exists(os.path.join(mirror, "shallow")):
+        # The shallow window missed the deadline: fetch the full (blobless) history and retry
+        with stage_slots["clone"]:
+            git("-C", mirror, "fetch", "-q", "--unshallow", "--filter=blob:none", "origin")
+        commit = git(*log_args, "--format=%H", "-n", "1", "--")
+    cache[key] = {"tip": tip, "commit": commit}
+    with open(cache_path, "w") as f:
+        json.dump(cache, f)
+    return commit
+
+
+@traced("clone")
 def clone_latest_branch(id: str, head: HEAD, deadline: datetime, evals: list[Eval]):
     """Ensure the latest commit on the branch is before the deadline."""
     repo_path = os.path.join(root, id)
 
-    # Clean up the repo if it exists to avoid problems with forced pushes.
-    if os.path.exists(repo_path):
-        if os.getenv("SKIP_CLONE") == "Y":
-            return evals.append(Eval(0.5, 0.5, "public_repo", "exists"))
-        shutil.rmtree(repo_path)
+    if os.path.exists(repo_path) and os.getenv("SKIP_CLONE") == "Y":
+        return evals.append(Eval(0.5, 0.5, "public_repo", "exists"))
 
-    # Clone the repo
     try:
-        repo_url = f"https://github.com/{head.owner}/{head.repo}.git"
-        cmd = ["git", "clone", "-q", "--single-branch", "-b", head.branch, repo_url, repo_path]
-        log(f"[blue]{id}[/blue] [yellow]CLONE[/yellow] {repo_url}")
-        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
-        run(cmd, check=True, capture_output=True, text=True, env=env)
-
-        # Get the latest commit before the deadline
-        log_cmd = ["git", "-C", repo_path, "log", "-q", head.branch]
-        log_cmd.extend(["--before", deadline.isoformat(), "--format=%H", "-n", "1", "--"])
-        log(f"[blue]{id}[/blue] [yellow]LOG[/yellow] {repo_url}")
-        commit = run(log_cmd, stdout=PIPE, text=True, check=True).stdout.strip()
-
-        # Checkout the commit
-        if commit:
+        # Update the cached mirror and get the latest commit before the deadline
+        repo_url = f"{git_base_url}/{head.owner}/{head.repo}.git"
+        log(f"[blue]{id}[/blue] [yellow]FETCH[/yellow] {repo_url}")
+        mirror = os.path.join(mirrors_dir, head.owner, f"{head.repo}.git")
+        with mirror_locks.setdefault(mirror, threading.Lock()):
+            update_mirror(mirror, head, deadline)
+            commit = resolve_deadline_commit(mirror, head.branch, deadline)
+            if not commit:
+                raise ValueError(f"No commits on branch {head.branch} before {deadline}")
+
+            # Check out the commit in a worktree of the mirror. Evaluation outputs under eval/ survive;
+            # everything else is reset, which also undoes forced pushes.
             log(f"[blue]{id}[/blue] [yellow]CHECKOUT[/yellow] {commit}")
-            run(["git", "-C", repo_path, "checkout", "--quiet", commit], check=True)
-        else:
-            raise ValueError(f"No commits on branch {head.branch} before {deadline}")
+            if os.path.isfile(os.path.join(repo_path, ".git")):
+                git("-C", repo_path, "checkout", "-q", "--force", "--detach", commit)
+                git("-C", repo_path, "clean", "-q", "-ffdx", "--exclude=/eval/")
+            else:
+                if os.path.exists(repo_path):
+                    shutil.rmtree(repo_path)
+                git("-C", mirror, "worktree", "prune")
+                git("-C", mirror, "worktree", "add", "-q", "--force", "--detach", repo_path, commit)
         evals.append(Eval(0.5, 0.5, "public_repo", "exists"))
     except Exception as e:
-        evals.append(Eval(0.0, 0.5, "public_repo", str(e)))
+        reason = e.stderr.strip() if getattr(e, "stderr", None) else str(e)
+        evals.append(Eval(0.0, 0.5, "public_repo", reason))
 
 
 def has_mit_license(id: str, evals: list[Eval]) -> bool:
@@ -165,33 +636,301 @@ def has_required_files(id: str, evals: list[Eval]):
         evals.append(Eval(marks, total, pattern, "present" if marks else "missing"))
 
 
+# Bump when run_on_dataset changes how submissions are executed, to invalidate every run fingerprint
+evaluator_version = "4"
+script_metadata_re = re.compile(r"(?m)^# /// script$\s(?P<content>(^#(| .*)$\s)+)^# ///$")
+
+
+def script_metadata(code: str) -> str:
+    """The inline `# /// script` (PEP 723) block of a script, or "" if it has none."""
+    match = script_metadata_re.search(code)
+    return match.group("content") if match else ""
+
+
+def run_fingerprint(script: str, dataset: str) -> str:
+    """Hash of everything that determines a run's output: script, dependencies, dataset, run limits, evaluator."""
+    with open(script, "rb") as f:
+        code = f.read()
+    parts = {
+        "script": hashlib.sha256(code).hexdigest(),
+        "metadata": script_metadata(code.decode("utf-8", errors="replace")),
+        "dataset": dataset_manifest[dataset]["sha256"],
+        "evaluator": evaluator_version,
+        # A run that timed out or hit a resource limit must rerun when the limits change
+        "timeout": run_timeout,
+        "limits": run_limits,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# Submissions run in pooled virtualenvs under .envs/, one per normalized dependency set, built with uv on
+# first use (set UV_INDEX_URL / UV_FIND_LINKS to build from a local index). SKIP_ENV_POOL=Y uses `uv run`.
+envs_dir = os.path.join(root, ".envs")
+env_locks = {}
+importtime_re = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\S.*)$")
+
+
+def normalize_requirement(requirement: str) -> str:
+    """Canonical form of a requirement: PEP 503 name, no whitespace."""
+    name, rest = re.match(r"\s*([A-Za-z0-9][A-Za-z0-9._-]*)(.*)", requirement).groups()
+    return re.sub(r"[-_.]+", "-", name).lower() + re.sub(r"\s+", "", rest)
+
+
+def script_requirements(code: str) -> dict | None:
+    """requires-python and sorted, normalized dependencies from a script's inline metadata."""
+    metadata = script_metadata(code)
+    if not metadata:
+        return None
+    lines = metadata.splitlines(keepends=True)
+    data = tomllib.loads("".join(line[2:] if line.startswith("# ") else line[1:] for line in lines))
+    dependencies = sorted({normalize_requirement(dep) for dep in data.get("dependencies", [])})
+    return {"requires-python": data.get("requires-python", ""), "dependencies": dependencies}
+
+
+@traced("env_pool")
+def pooled_interpreter(script: str) -> tuple[str, float]:
+    """Python of the pooled environment matching the script's dependencies, and the seconds spent getting it.
+
+    The environment is built once per dependency set; later calls only look it up.
+    """
+    with open(script, encoding="utf-8", errors="replace") as f:
+        requirements = script_requirements(f.read())
+    if requirements is None:
+        raise ValueError("no inline script metadata")
+    key = hashlib.sha256(json.dumps(requirements, sort_keys=True).encode()).hexdigest()[:16]
+    env_dir = os.path.join(envs_dir, key)
+    python = os.path.join(env_dir, "bin", "python")
+    start = time.time()
+    with env_locks.setdefault(key, threading.Lock()):
+        if not os.path.exists(os.path.join(env_dir, "env.json")):
+            log(f"[yellow]BUILD ENV[/yellow] {key} {' '.join(requirements['dependencies'])}")
+            shutil.rmtree(env_dir, ignore_errors=True)
+            python_request = ["--python", requirements["requires-python"]] if requirements["requires-python"] else []
+            run(["uv", "venv", "-q", *python_request, env_dir], check=True, capture_output=True, text=True)
+            if requirements["dependencies"]:
+                install = ["uv", "pip", "install", "-q", "--python", python, *requirements["dependencies"]]
+                run(install, check=True, capture_output=True, text=True)
+            with open(os.path.join(env_dir, "env.json"), "w") as f:
+                json.dump({**requirements, "build_time": round(time.time() - start, 3)}, f, indent=2)
+    return python, time.time() - start
+
+
+def split_importtime(stderr: str) -> tuple[float, str]:
+    """Separate `-X importtime` lines from stderr: (seconds spent in top-level imports, remaining stderr)."""
+    seconds, rest = 0.0, []
+    for line in stderr.splitlines(keepends=True):
+        match = importtime_re.match(line.rstrip("\n"))
+        if match:
+            seconds += int(match.group(1)) / 1e6
+        elif not line.startswith("import time:"):
+            rest.append(line)
+    return seconds, "".join(rest)
+
+
+# Resource limits for each submission run. RUN_MAX_PROCS is RLIMIT_NPROC, which counts all of the user's
+# processes, so it is off (0) by default.
+run_timeout = float(os.getenv("RUN_TIMEOUT", "180"))
+run_limits = {
+    resource.RLIMIT_AS: int(float(os.getenv("RUN_MEMORY_MB", "8192")) * 1024 * 1024),
+    resource.RLIMIT_CPU: int(os.getenv("RUN_CPU_SECONDS", str(int(2 * run_timeout)))),
+    resource.RLIMIT_NPROC: int(os.getenv("RUN_MAX_PROCS", "0")),
+}
+
+
+rss_sample_interval = float(os.getenv("RUN_RSS_SAMPLE_SECONDS", "0.2"))
+
+
+def session_hwm_kb(session: int) -> int:
+    """Sum of VmHWM (each process's own peak RSS since exec) over the live processes of a session, in KB."""
+    total = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # Fields after the parenthesized command: state, ppid, pgrp, session, ...
+                if int(f.read().rsplit(")", 1)[1].split()[3]) != session:
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                total += next((int(line.split()[1]) for line in f if line.startswith("VmHWM:")), 0)
+        except (OSError, ValueError, IndexError):
+            continue
+    return total
+
+
+def kill_group(pid: int):
+    """Kill a process and everything else in its session."""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_sandboxed(
+    cmd: list[str], cwd: str, timeout: float, env: dict | None = None
+) -> tuple[int | None, str, str, dict]:
+    """Run cmd in its own session under run_limits, killing the whole group on timeout.
+
+    Returns (exit code or None on timeout, stdout, stderr, metrics) where metrics has wall and CPU seconds
+    of the process tree from wait4(), and its peak RSS sampled from /proc (None where there is no /proc).
+    """
+    timed_out, finished, peak_kb = threading.Event(), threading.Event(), [0]
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        start = time.time()
+        process = Popen(cmd, cwd=cwd, env=env, stdout=out, stderr=err, start_new_session=True)
+        # Limits are applied right after spawn: preexec_fn is unsafe with the --workers threads
+        for limit, value in run_limits.items():
+            if value > 0:
+                try:
+                    resource.prlimit(process.pid, limit, (value, value))
+                except (OSError, ValueError):
+                    pass
+
+        def expire():
+            timed_out.set()
+            kill_group(process.pid)
+
+        # ru_maxrss would include the evaluator's own RSS, which Linux carries across exec. VmHWM starts
+        # afresh at exec, so sample it for the whole session until the run ends.
+        def sample_rss():
+            while True:
+                peak_kb[0] = max(peak_kb[0], session_hwm_kb(process.pid))
+                if finished.wait(rss_sample_interval):
+                    return
+
+        sampler = threading.Thread(target=sample_rss, daemon=True) if os.path.isdir("/proc") else None
+        if sampler:
+            sampler.start()
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+            finished.set()
+            if sampler:
+                sampler.join()
+        # Mark the Popen as reaped, and kill anything the submission left behind in its session
+        process.returncode = os.waitstatus_to_exitcode(status)
+        kill_group(process.pid)
+        out.seek(0)
+        err.seek(0)
+        stdout = out.read().decode("utf-8", errors="replace")
+        stderr = err.read().decode("utf-8", errors="replace")
+    metrics = {
+        "wall": round(time.time() - start, 3),
+        "cpu_user": round(usage.ru_utime, 3),
+        "cpu_system": round(usage.ru_stime, 3),
+        "peak_rss_mb": round(peak_kb[0] / 1024, 1) if sampler else None,
+        "timed_out": timed_out.is_set(),
+        "signal": -process.returncode if process.returncode < 0 else None,
+    }
+    return (None if timed_out.is_set() else process.returncode), stdout, stderr, metrics
+
+
+def empty_dir(path: str):
+    shutil.rmtree(path)
+    os.makedirs(path)
+
+
 def run_on_dataset(id: str, dataset: str, evals: list[Eval], total: float):
+    """Run autolysis on a dataset unless an earlier run with the same fingerprint can be reused.
+
+    Each run is recorded in eval/{dataset}.run.json with its fingerprint, exit status and runtime.
+    FORCE_RERUN=Y ignores the record; SKIP_RERUN=Y reuses any existing outputs.
+    """
     msg = f"[blue]{id}[/blue] [yellow]uv run autolysis[/yellow] {dataset}"
+    test = f"uv run autolysis {dataset}"
     cwd = os.path.join(root, id, "eval", dataset)
     os.makedirs(cwd, exist_ok=True)
     script = os.path.join(root, id, "autolysis.py")
     if not os.path.exists(script):
-        evals.append(Eval(0.0, total, f"uv run autolysis {dataset}", "missing"))
+        empty_dir(cwd)
+        evals.append(Eval(0.0, total, test, "missing"))
+        return False
+    try:
+        dataset_path = submission_dataset(id, dataset)
+    except Exception as e:
+        empty_dir(cwd)
+        evals.append(Eval(0.0, total, test, str(e)))
+        log(f"{msg} [red]FAIL[/red]: {e}", last=True)
         return False
-    cmd = ["uv", "run", script, os.path.join(root, "datasets", dataset)]
+    record_path = os.path.join(root, id, "eval", f"{dataset}.run.json")
+    record = {}
+    if os.path.exists(record_path):
+        with open(record_path) as f:
+            record = json.load(f)
+    fingerprint = run_fingerprint(script, dataset)
     error = get_output_files(id, os.path.join("eval", dataset)).error
-    if error or os.getenv("SKIP_RERUN") != "Y":
+
+    # Reuse a recorded failure as is, and a recorded success only if its outputs are still there
+    reuse = record.get("fingerprint") == fingerprint and (bool(record.get("error")) or not error)
+    reuse = (reuse and os.getenv("FORCE_RERUN") != "Y") or (not error and os.getenv("SKIP_RERUN") == "Y")
+    if reuse and record.get("error"):
+        evals.append(Eval(0.0, total, test, record["error"]))
+        log(f"{msg} [red]FAIL[/red] (cached): {record['error']}", last=True)
+        return False
+    if not reuse:
+        # eval/ survives checkouts: start from an empty directory so stale outputs are never graded
+        empty_dir(cwd)
+
+        # Prefer a warm pooled environment; fall back to `uv run` if there is none for this script
+        cmd, resolve_time = ["uv", "run", script, dataset_path], None
+        if os.getenv("SKIP_ENV_POOL") != "Y":
+            try:
+                python, resolve_time = pooled_interpreter(script)
+                cmd = [python, "-X", "importtime", script, dataset_path]
+            except Exception as e:
+                reason = e.stderr.strip() if getattr(e, "stderr", None) else str(e)
+                log(f"{msg} [yellow]ENV POOL[/yellow] falling back to uv run: {reason}", last=True)
         log(msg)
-        stderr = ""
+        stderr, returncode, import_time, metrics, start = "", None, None, {}, time.time()
         try:
-            result = run(cmd, check=False, capture_output=True, text=True, cwd=cwd, timeout=180)
+            with stage_slots["run"], trace_span("run", id=id, dataset=dataset) as span:
+                env = None
+                if span:
+                    env = {**os.environ, "TRACEPARENT": span.traceparent}
+                    env.setdefault("AUTOLYSIS_TRACE", trace_path)
+                returncode, _, stderr, metrics = run_sandboxed(cmd, cwd, run_timeout, env)
+                span.set(returncode=returncode, **metrics)
+            if returncode is None:
+                stderr = str(TimeoutExpired(cmd, run_timeout))
+            elif "importtime" in cmd:
+                import_time, stderr = split_importtime(stderr)
         except Exception as e:
             stderr = str(e)
-        if stderr or result.returncode != 0:
-            err_msg = stderr or result.stderr
-            evals.append(Eval(0.0, total, f"uv run autolysis {dataset}", err_msg))
+        runtime = time.time() - start
+        err_msg = (stderr if stderr.strip() else f"exit code {returncode}") if returncode != 0 else ""
+        record = {
+            "fingerprint": fingerprint,
+            "returncode": returncode,
+            "runtime": round(runtime, 3),
+            "timing": {
+                "resolve": round(resolve_time, 3) if resolve_time is not None else None,
+                "import": round(import_time, 3) if import_time is not None else None,
+                "execute": round(runtime - (import_time or 0), 3),
+            },
+            "metrics": metrics,
+            "error": err_msg,
+            "finished": datetime.now(timezone.utc).isoformat(),
+        }
+        timing = ", ".join(f"{k} {v:.1f}s" for k, v in record["timing"].items() if v is not None)
+        if metrics:
+            timing += f", cpu {metrics['cpu_user'] + metrics['cpu_system']:.1f}s"
+        if metrics.get("peak_rss_mb") is not None:
+            timing += f", rss {metrics['peak_rss_mb']:.0f}MB"
+        log(f"{msg} [green]TIMING[/green] {timing}", last=True)
+        with open(record_path, "w") as f:
+            json.dump(record, f, indent=2)
+        if err_msg:
+            evals.append(Eval(0.0, total, test, err_msg))
             log(f"{msg} [red]FAIL[/red]: {err_msg}", last=True)
             return False
     error = get_output_files(id, os.path.join("eval", dataset)).error
     if error:
-        evals.append(Eval(0.0, total, f"uv run autolysis {dataset}", error))
+        evals.append(Eval(0.0, total, test, error))
         return False
-    evals.append(Eval(total, total, f"uv run autolysis {dataset}", "ran"))
+    evals.append(Eval(total, total, test, "ran (cached)" if reuse else "ran"))
     return True
 
 
@@ -259,6 +998,7 @@ code_quality_group_counts = Counter(attribute.group for attribute in code_qualit
 code_quality_schema = {"name": "quality", "strict": True, "schema": get_schema(code_quality)}
 
 
+@traced("code_quality")
 def evaluate_code_quality(id: str, evals: list[Eval]):
     if os.getenv("SKIP_CODE_QUALITY") == "Y":
         return
@@ -271,10 +1011,8 @@ def evaluate_code_quality(id: str, evals: list[Eval]):
 
     # Evaluate the code quality
     log(f"[blue]{id}[/blue] [yellow]CODE QUALITY[/yellow]")
-    response = httpx.post(
-        f"{openai_api_base}/chat/completions",
-        headers=headers,
-        json={
+    result = chat_completion(
+        {
             "model": os.getenv("MODEL", "gpt-4o-mini"),
             "messages": [
                 {"role": "system", "content": code_system},
@@ -284,7 +1022,6 @@ def evaluate_code_quality(id: str, evals: list[Eval]):
         },
         timeout=180,
     )
-    result = response.json()
     content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
     if not content:
         log(f"[blue]{id}[/blue] [red]OpenAI error[/red] {result}", last=True)
@@ -337,6 +1074,69 @@ def get_output_files(id: str, path: str) -> OutputFiles:
     return OutputFiles(readme_files[0], image_files, error)
 
 
+# detail: "low" images are seen at 512px, so anything larger is wasted upload
+image_max_side = 512
+image_colors = 128
+# LRU of prepared data URLs by content hash, so identical charts across datasets and submissions are
+# recompressed once while memory stays bounded over the cohort
+prepared_images = OrderedDict()
+prepared_images_max = int(os.getenv("PREPARED_IMAGES_MAX", "64"))
+prepared_images_lock = threading.Lock()
+
+
+def prepare_image(path: str) -> tuple[str, str]:
+    """Downscale and recompress an image to the model's effective resolution. Returns (sha256, data URL)."""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    with prepared_images_lock:
+        if digest in prepared_images:
+            prepared_images.move_to_end(digest)
+            return digest, prepared_images[digest]
+    with Image.open(path) as image:
+        image.thumbnail((image_max_side, image_max_side), Image.Resampling.LANCZOS)
+        # Flatten transparency onto white, then quantize: charts have few colors and compress well
+        rgb = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        rgb.paste(rgba, mask=rgba.getchannel("A"))
+        buffer = io.BytesIO()
+        rgb.quantize(image_colors).save(buffer, format="PNG", optimize=True)
+    # Keep the original if recompression did not help
+    encoded = buffer.getvalue() if buffer.tell() < len(data) else data
+    url = f"data:image/png;base64,{base64.b64encode(encoded).decode('utf-8')}"
+    with prepared_images_lock:
+        prepared_images[digest] = url
+        while len(prepared_images) > prepared_images_max:
+            prepared_images.popitem(last=False)
+    return digest, url
+
+
+def image_parts(image_files: list[str], seen: set[str]) -> list[dict]:
+    """Image content parts for the files not already in `seen` (which is updated)."""
+    parts = []
+    for image_file in image_files:
+        digest, url = prepare_image(image_file)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        parts.append({"type": "image_url", "image_url": {"url": url, "detail": "low"}})
+    return parts
+
+
+def upload_kb(content: list) -> float:
+    """Approximate upload size of a message's content parts in KB."""
+    return len(json.dumps(content)) / 1024
+
+
+def add_output_evals(path: str, answers: dict, evals: list[Eval]):
+    for attribute in output_quality:
+        total = 1.0 / output_quality_group_counts[attribute.group]
+        ans = answers[attribute.name]
+        attr = f"{path}: {attribute.name}"
+        evals.append(Eval(total if ans["answer"] else 0, total, attr, ans["reasoning"]))
+
+
+@traced("output_quality")
 def evaluate_output_quality(id: str, path: str, evals: list[Eval]):
     readme_file, image_files, error = get_output_files(id, os.path.join("eval", path))
     if error:
@@ -344,51 +1144,231 @@ def evaluate_output_quality(id: str, path: str, evals: list[Eval]):
         return
     readme = open_encoded(readme_file)
 
-    # Take the first 5 images in the submission
-    images = []
-    for image_file in image_files:
-        with open(image_file, "rb") as f:
-            image = base64.b64encode(f.read()).decode("utf-8")
-            images.append(
-                {
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{image}", "detail": "low"},
-                }
-            )
+    # Take the first 5 images in the submission, downscaled and without duplicates
+    images = image_parts(image_files, set())
 
     # Evaluate the output quality
-    log(f"[blue]{id}[/blue] [yellow]OUTPUT QUALITY[/yellow] {path}")
-    response = httpx.post(
-        f"{openai_api_base}/chat/completions",
-        headers=headers,
-        json={
+    content = [readme, *images]
+    log(
+        f"[blue]{id}[/blue] [yellow]OUTPUT QUALITY[/yellow] {path} "
+        f"({len(images)} images, {upload_kb(content):.0f} KB)"
+    )
+    result = chat_completion(
+        {
             "model": os.getenv("MODEL", "gpt-4o-mini"),
             "messages": [
                 {"role": "system", "content": output_system},
-                {"role": "user", "content": [readme, *images]},
+                {"role": "user", "content": content},
             ],
             "response_format": {"type": "json_schema", "json_schema": output_quality_schema},
         },
         timeout=180,
     )
-    result = response.json()
     content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
     if not content:
         log(f"[blue]{id}[/blue] [red]OpenAI error[/red] {result}", last=True)
         return
-    answers = json.loads(content)
-    for attribute in output_quality:
-        total = 1.0 / output_quality_group_counts[attribute.group]
-        ans = answers[attribute.name]
-        attr = f"{path}: {attribute.name}"
-        evals.append(Eval(total if ans["answer"] else 0, total, attr, ans["reasoning"]))
+    add_output_evals(path, json.loads(content), evals)
+
+
+@traced("output_quality_batch")
+def evaluate_output_quality_batch(id: str, paths: list[str], evals: list[Eval]):
+    """Evaluate the outputs of several datasets in one request, with one answer object per dataset.
+
+    Images repeated across datasets (e.g. identical boilerplate charts) are sent once.
+    """
+    content, seen, names = [], set(), []
+    for path in paths:
+        readme_file, image_files, error = get_output_files(id, os.path.join("eval", path))
+        if error:
+            evals.append(Eval(0.0, 0.0, f"output: {path}", error))
+            continue
+        names.append(path)
+        images = image_parts(image_files, seen)
+        content.append({"type": "text", "text": f"## Dataset: {path}\n\n{open_encoded(readme_file)}"})
+        content.extend(images)
+    if not names:
+        return
+
+    quality = get_schema(output_quality)
+    schema = {
+        "type": "object",
+        "properties": {name: quality for name in names},
+        "required": names,
+        "additionalProperties": False,
+    }
+    images = sum(1 for part in content if part["type"] == "image_url")
+    log(
+        f"[blue]{id}[/blue] [yellow]OUTPUT QUALITY[/yellow] {len(names)} datasets "
+        f"({images} images, {upload_kb(content):.0f} KB)"
+    )
+    system = (
+        output_system
+        + "\nThe user message contains several datasets, each starting with '## Dataset: <name>' "
+        + "followed by its README and charts. Evaluate each dataset independently under its name."
+    )
+    result = chat_completion(
+        {
+            "model": os.getenv("MODEL", "gpt-4o-mini"),
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": content},
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": "quality", "strict": True, "schema": schema},
+            },
+        },
+        timeout=300,
+    )
+    answer = result.get("choices", [{}])[0].get("message", {}).get("content", "")
+    if not answer:
+        log(f"[blue]{id}[/blue] [red]OpenAI error[/red] {result}", last=True)
+        return
+    answers = json.loads(answer)
+    for name in names:
+        add_output_evals(name, answers[name], evals)
+
+
+results_db_path = os.path.join(root, "results.sqlite")
+results_csv_path = os.path.join(root, "results.csv")
+results_columns = ["marks", "total", "test", "reason", "id", "correct"]
+
+
+def results_db() -> sqlite3.Connection:
+    """Open the append-only results store (WAL, fsync on every commit), creating it if required."""
+    os.makedirs(root, exist_ok=True)
+    db = sqlite3.connect(results_db_path, timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=FULL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS results "
+        "(marks REAL, total REAL, test TEXT, reason TEXT, id TEXT, correct INTEGER)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS results_id ON results (id)")
+    return db
+
+
+def save_result(result: pd.DataFrame):
+    """Replace one submission's rows in the results store in a single durable transaction."""
+    result = result.assign(
+        correct=(result.marks == result.total).astype(int),
+        reason=result.reason.astype(str).str.replace("\n", " ", regex=False),
+    )[results_columns]
+    with results_db() as db:
+        db.execute("DELETE FROM results WHERE id = ?", (result.id.iloc[0],))
+        db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)", result.itertuples(index=False))
+
+
+def import_legacy_results():
+    """Import a results.csv written before the store existed, the first time the store is created."""
+    if not os.path.exists(results_db_path) and os.path.exists(results_csv_path):
+        with results_db() as db:
+            legacy = pd.read_csv(results_csv_path)
+            legacy["correct"] = (legacy.marks == legacy.total).astype(int)
+            rows = legacy[results_columns].astype(object).where(legacy.notna(), None)
+            db.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)", rows.itertuples(index=False))
+
+
+def evaluated_ids() -> set[str]:
+    """IDs already in the results store, read through the id index."""
+    import_legacy_results()
+    with results_db() as db:
+        return {id for (id,) in db.execute("SELECT DISTINCT id FROM results")}
+
+
+def export_results(path: str = results_csv_path):
+    """Compact the results store and export it as CSV."""
+    import_legacy_results()
+    db = results_db()
+    try:
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        db.execute("VACUUM")
+        pd.read_sql_query("SELECT * FROM results ORDER BY rowid", db).to_csv(path, index=False)
+    finally:
+        db.close()
+
+
+@traced("submission")
+def evaluate_submission(row) -> pd.DataFrame:
+    """Run every check for one submission and return its evals as a DataFrame."""
+    current_span().set(id=row.id)
+    evals = []
+    start = time.time()
+
+    # Clone the repo and check for the MIT license and required files
+    clone_latest_branch(row.id, row["head"], deadline, evals)
+    has_mit_license(row.id, evals)
+    has_required_files(row.id, evals)
+
+    # Code evaluation
+    evaluate_code_quality(row.id, evals)
+
+    # Submission: Run evaluation for each sample dataset
+    success = {}
+    datasets = list(sample_datasets.keys())
+    datasets = datasets[:int(os.getenv("LIMIT_SAMPLE_DATASETS_RUN", len(sample_datasets)))]
+    if len(datasets):
+        for dataset in datasets:
+            success[dataset] = run_on_dataset(row.id, dataset, evals, 0.5)
+        all_ran = 0.5 if all(success.values()) else 0.0
+        msg = "ran" if all_ran else "did not run all"
+        evals.append(Eval(all_ran, 0.5, "uv run autolysis *", msg))
+
+    # Evaluate one random output from successful runs of sample datasets
+    samples_ran = []
+    for dataset in sample_datasets:
+        if not get_output_files(row.id, os.path.join("eval", dataset)).error:
+            samples_ran.append(dataset)
+    if len(samples_ran) and os.getenv("SKIP_SAMPLE_DATASETS_EVAL") != "Y":
+        # A private generator keeps the choice reproducible when submissions run concurrently
+        rng = random.Random(row.id + os.getenv("AIPROXY_TOKEN", ""))
+        evaluate_output_quality(row.id, rng.choice(samples_ran), evals)
+
+    # Evaluate test datasets
+    # BATCH_OUTPUT_EVAL=Y evaluates all test outputs in a single request
+    if os.getenv("SKIP_TEST_DATASETS") != "Y" and os.getenv("BATCH_OUTPUT_EVAL") == "Y":
+        for dataset in test_datasets:
+            run_on_dataset(row.id, dataset, evals, 0.0)
+        evaluate_output_quality_batch(row.id, list(test_datasets), evals)
+    elif os.getenv("SKIP_TEST_DATASETS") != "Y":
+        for dataset, id in test_datasets.items():
+            run_on_dataset(row.id, dataset, evals, 0.0)
+            evaluate_output_quality(row.id, dataset, evals)
+
+    result = pd.DataFrame(evals)
+    result["id"] = row.id
+    score, total = round(result.marks.sum(), 2), round(result.total.sum(), 2)
+    duration = time.time() - start
+    current_span().set(score=score, total=total)
+    msg = f"[blue]{row.id}[/blue] [yellow]{duration:.0f}s[/yellow]"
+    log(f"{msg} [green]SCORE[/green] {score} / {total}", last=True)
+    return result
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate student project submissions")
     parser.add_argument("url", nargs="*", help="GitHub raw URL for submission(s)")
+    parser.add_argument("--workers", type=int, default=1, help="Submissions to evaluate concurrently")
+    parser.add_argument("--clone-workers", type=int, help="Concurrent git clones (default: --workers)")
+    parser.add_argument("--run-workers", type=int, help="Concurrent `uv run`s (default: --workers)")
+    parser.add_argument("--llm-workers", type=int, help="Concurrent LLM requests (default: --workers)")
+    parser.add_argument("--export", action="store_true", help="Only compact and export results.csv")
+    parser.add_argument("--trace-summary", metavar="PATH", help="Print p50/p95 per stage of a trace and exit")
     args = parser.parse_args()
 
+    if args.trace_summary:
+        console.print(trace_summary(args.trace_summary).round(3).to_string())
+        sys.exit(0)
+
+    if args.export:
+        if not evaluated_ids() and os.path.exists(results_csv_path):
+            log(f"[yellow]Results store is empty[/yellow]: kept {results_csv_path}", last=True)
+            sys.exit(1)
+        export_results()
+        log(f"[green]Results[/green]: {results_csv_path}", last=True)
+        sys.exit(0)
+
     if os.getenv("SUBMISSION_URL"):
         submissions_form = pd.read_csv(os.environ["SUBMISSION_URL"])
 
@@ -418,87 +1398,59 @@ if __name__ == "__main__":
     submissions["id"] = submissions[submissions.columns[1]].str.split("@").str[0]
     submissions["head"] = submissions[submissions.columns[2]].apply(parse_github_url)
 
+    # Workers share root/<id>, so evaluate each student once: their last (latest) row in the sheet
+    duplicates = submissions.id.duplicated(keep="last")
+    if duplicates.any():
+        submissions = submissions[~duplicates]
+        log(f"[yellow]Skipped[/yellow] {sum(duplicates)} earlier submissions by the same students", last=True)
+
     # Pick a random sample of submissions to evaluate
     if os.getenv("SAMPLE_SUBMISSIONS"):
         size = int(os.getenv("SAMPLE_SUBMISSIONS"))
         if size < len(submissions):
             submissions = submissions.sample(size)
 
-    # If we're continuing from where we left off, read the results
-    results = []
+    # If we're continuing from where we left off, skip submissions already in the results store.
+    # Explicitly requested submissions are re-evaluated and replace their earlier rows.
     if os.getenv("CONTINUE") == "Y":
-        result = pd.read_csv(os.path.join(root, "results.csv"))
-        # Remove results for explicitly requested submissions
-        results = [result[~result.id.isin(requested_ids)]]
-        ids = results[0].id.unique()
-        # Skip submissions that we've already evaluated
-        skip = submissions.id.isin(ids)
+        skip = submissions.id.isin(evaluated_ids() - requested_ids)
         submissions = submissions[~skip]
         log(f"[green]Skipped[/green] {sum(skip)} submissions", last=True)
-
-    # Now, evalute each submission
-    for _, row in submissions.iterrows():
-        evals = []
-        try:
-            start = time.time()
-
-            # Make sure other submmissions haven't overwritten the dataset
-            download_datasets()
-
-            # Clone the repo and check for the MIT license and required files
-            clone_latest_branch(row.id, row["head"], deadline, evals)
-            has_mit_license(row.id, evals)
-            has_required_files(row.id, evals)
-
-            # Code evaluation
-            evaluate_code_quality(row.id, evals)
-
-            # Submission: Run evaluation for each sample dataset
-            success = {}
-            datasets = list(sample_datasets.keys())
-            datasets = datasets[:int(os.getenv("LIMIT_SAMPLE_DATASETS_RUN", len(sample_datasets)))]
-            if len(datasets):
-                for dataset in datasets:
-                    success[dataset] = run_on_dataset(row.id, dataset, evals, 0.5)
-                all_ran = 0.5 if all(success.values()) else 0.0
-                msg = "ran" if all_ran else "did not run all"
-                evals.append(Eval(all_ran, 0.5, "uv run autolysis *", msg))
-
-            # Evaluate one random output from successful runs of sample datasets
-            samples_ran = []
-            for dataset in sample_datasets:
-                if not get_output_files(row.id, os.path.join("eval", dataset)).error:
-                    samples_ran.append(dataset)
-            if len(samples_ran) and os.getenv("SKIP_SAMPLE_DATASETS_EVAL") != "Y":
-                random.seed(row.id + os.getenv("AIPROXY_TOKEN", ""), version=2)
-                evaluate_output_quality(row.id, random.choice(samples_ran), evals)
-
-            # Evaluate test datasets
-            if os.getenv("SKIP_TEST_DATASETS") != "Y":
-                for dataset, id in test_datasets.items():
-                    run_on_dataset(row.id, dataset, evals, 0.0)
-                    evaluate_output_quality(row.id, dataset, evals)
-
-            result = pd.DataFrame(evals)
-            result["id"] = row.id
-            results.append(result)
-            score, total = round(result.marks.sum(), 2), round(result.total.sum(), 2)
-            duration = time.time() - start
-            msg = f"[blue]{row.id}[/blue] [yellow]{duration:.0f}s[/yellow]"
-            log(f"{msg} [green]SCORE[/green] {score} / {total}", last=True)
-        except Exception as e:
-            log(f"{msg} [red]UNEXPECTED FAILURE[/red] {e}", last=True)
-            continue
-
-        if len(results):
-            # Print only the last result if there's only one submission (plus history)
-            if len(results) <= 2:
-                print(pd.DataFrame(results[-1]))
-
-            # Save the results to a CSV file on each iteration
-            out = pd.concat(results)
-            out["correct"] = out.apply(lambda row: row.marks == row.total, axis=1).astype(int)
-            out["reason"] = out.apply(lambda row: row.reason.replace("\n", " "), axis=1)
-            out.to_csv(os.path.join(root, "results.csv"), index=False)
-
-    log(f"[green]Results[/green]: {os.path.join(root, 'results.csv')}", last=True)
+    else:
+        with results_db() as db:
+            db.execute("DELETE FROM results")
+
+    # Download the datasets once. Each run gets its own read-only link, verified against the manifest.
+    download_datasets()
+
+    # Now, evalute the submissions, `--workers` at a time. Only this thread writes results.
+    stage_slots["clone"] = threading.BoundedSemaphore(args.clone_workers or args.workers)
+    stage_slots["run"] = threading.BoundedSemaphore(args.run_workers or args.workers)
+    stage_slots["llm"] = threading.BoundedSemaphore(args.llm_workers or args.workers)
+    pool_start, done, pending = time.time(), 0, len(submissions)
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(evaluate_submission, row): row.id for _, row in submissions.iterrows()}
+        for future in as_completed(futures):
+            done += 1
+            elapsed = time.time() - pool_start
+            eta = elapsed / done * (pending - done)
+            progress = f"[green]PROGRESS[/green] {done}/{pending} in {elapsed:.0f}s, ETA {eta:.0f}s"
+            try:
+                result = future.result()
+            except Exception as e:
+                log(f"[blue]{futures[future]}[/blue] [red]UNEXPECTED FAILURE[/red] {e}", last=True)
+                continue
+            finally:
+                log(progress, last=True)
+
+            # Print the result if there's only one submission
+            if pending == 1:
+                print(result)
+
+            # Append this submission's rows to the results store on each iteration
+            save_result(result)
+
+    export_results()
+    hits, misses = llm_cache_stats["hit"], llm_cache_stats["miss"]
+    log(f"[green]LLM cache[/green]: {hits} hits, {misses} misses", last=True)
+    log(f"[green]Results[/green]: {results_csv_path}", last=True)
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autolysis  # noqa: E402
+
+
+def test_zero_row_frame(tmp_path):
+    path = tmp_path / 'header_only.csv'
+    path.write_text('a,b,label\n')
+    distributions = autolysis.compute_distributions(pd.read_csv(path, dtype={'a': float, 'b': 'int64'}))
+    assert distributions['a']['count'] == 0
+    assert distributions['a']['counts'].sum() == 0
+    assert distributions['a']['density'] is None
+    assert autolysis.describe_distributions(distributions)['b']['skew'] is None
+
+
+def test_infinite_values_are_left_out():
+    df = pd.DataFrame({'a': [1.0, np.inf, 3.0, -np.inf, 2.0], 'b': list('vwxyz')})
+    dist = autolysis.compute_distributions(df)['a']
+    assert dist['count'] == 3
+    assert dist['counts'].sum() == 3
+    assert (dist['bin_edges'][0], dist['bin_edges'][-1]) == (1.0, 3.0)
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autolysis  # noqa: E402
+
+
+def write_split_csv(path):
+    """A ~365 KB UTF-8 CSV whose first window ends in the middle of a two-byte character."""
+    header = 'name,value\n'
+    filler = 'x' * (autolysis.ENCODING_WINDOW_BYTES - 1 - len(header) - len(',0\n'))
+    text = header + filler + ',0\n' + 'é,1\n' * 30_000
+    data = text.encode('utf-8')
+    assert data[autolysis.ENCODING_WINDOW_BYTES - 1:autolysis.ENCODING_WINDOW_BYTES + 1] == 'é'.encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def test_character_split_across_sequential_windows(tmp_path, monkeypatch):
+    monkeypatch.setattr(autolysis, 'CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'split.csv'
+    write_split_csv(path)
+    assert autolysis.sniff_encoding(path) == 'utf-8'
+    assert autolysis.sniff_encoding(path, full_scan=True) == 'utf-8'
+    assert autolysis._fallback_encoding(path) == 'utf-8'
+    df = autolysis.load_data(str(path), cache_mode='off')
+    assert df['name'].iloc[-1] == 'é'
+
+
+def test_invalid_utf8_falls_back_to_a_byte_transparent_codec(tmp_path, monkeypatch):
+    monkeypatch.setattr(autolysis, 'CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'latin.csv'
+    path.write_bytes(b'name,value\n' + b'abc,1\n' * 100 + b'caf\xe9,2\n')
+    assert autolysis._fallback_encoding(path) != 'utf-8'
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import autolysis  # noqa: E402
+
+
+def test_moment_sketch_skips_empty_chunks():
+    sketch = autolysis.MomentSketch(2)
+    sketch.update(np.empty((0, 2)))
+    sketch.update(np.array([[1.0, 2.0], [3.0, 6.0]]))
+    assert sketch.n[0, 0] == 2
+    assert sketch.min.tolist() == [1.0, 2.0]
+    assert sketch.max.tolist() == [3.0, 6.0]
+
+
+def test_header_only_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(autolysis, 'CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'header_only.csv'
+    path.write_text('a,b,label\n')
+    analysis, sample = autolysis.analyze_stream(str(path))
+    assert len(sample) == 0
+    assert analysis['missing_values'] == {'a': 0, 'b': 0, 'label': 0}
+
+
+def test_correlation_matches_full_mode(tmp_path, monkeypatch):
+    monkeypatch.setattr(autolysis, 'CACHE_DIR', str(tmp_path / 'cache'))
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(500, 30)), columns=[f'c{i}' for i in range(30)])
+    df['c1'] += df['c0']
+    path = tmp_path / 'wide.csv'
+    df.to_csv(path, index=False)
+    streamed, _ = autolysis.analyze_stream(str(path), chunksize=100)
+    full = autolysis.analyze_data(df)
+    assert list(streamed['correlation']) == list(full['correlation'])
+    assert len(streamed['correlation']) == autolysis.CORRELATION_MATRIX_COLUMNS
+    assert [pair[:2] for pair in streamed['correlation_pairs']] == [pair[:2] for pair in full['correlation_pairs']]
+    assert np.allclose([pair[2] for pair in streamed['correlation_pairs']],
+                       [pair[2] for pair in full['correlation_pairs']])
+
+
+def test_top_values_are_labelled_as_sketched(tmp_path, monkeypatch):
+    monkeypatch.setattr(autolysis, 'CACHE_DIR', str(tmp_path / 'cache'))
+    rng = np.random.default_rng(0)
+    names = np.char.add('name', rng.integers(0, 2000, size=5000).astype(str))
+    df = pd.DataFrame({'name': names, 'value': rng.normal(size=5000)})
+    path = tmp_path / 'names.csv'
+    df.to_csv(path, index=False)
+    analysis, _ = autolysis.analyze_stream(str(path), chunksize=500)
+    top = analysis['summary']['name']
+    assert top['freq'] <= (df['name'] == top['top']).sum()
+    _, sections = autolysis.prompt_sections(analysis)
+    headers = {title: header for title, header, _ in sections}
+    assert headers['Categorical columns (cardinality)'] == [
+        'column', 'unique (approximate)', 'top (approximate)', 'freq (lower bound)']